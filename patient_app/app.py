@@ -19,14 +19,25 @@ AI-CARE Lung 病人端應用程式 v2.2
 """
 
 import streamlit as st
+from streamlit.errors import StreamlitAPIException
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, date
+import importlib.util
+import io
+import itertools
 import json
+from pathlib import Path
+import re
+import threading
+import time
 import uuid
 
 # 匯入更新版模組
 from models import (
     SymptomType, ReportMethod, MessageRole, MessageSource,
     SYMPTOM_DEFINITIONS, OPEN_ENDED_QUESTIONS, DEFAULT_ACHIEVEMENTS,
+    PatientProfile, Compliance, calculate_age,
     generate_report_id, generate_session_id
 )
 from conversation_store import (
@@ -34,253 +45,233 @@ from conversation_store import (
     log_open_ended_response
 )
 from expert_templates import (
-    template_manager, get_expert_response, get_symptom_response
+    get_expert_response, get_symptom_response
+)
+from content import (
+    Symptom, SYMPTOMS, N_SYMPTOMS, SCORE_OPTIONS, SCORE_CHOICES,
+    REPORT_STATUS, WEEKDAY_NAMES,
+    CHAT_AVATARS, CHAT_TAIL, FIRST_QUESTION_MD, NEXT_QUESTION_MD,
+    ASK_SCORE_MD, SUMMARY_HEADER_MD,
+    EDUCATION_CATEGORY_BY_ID, EDUCATION_CATEGORY_NAMES, EMERGENCY_CONTACT_HTML,
+    SYMPTOM_HEADER_HTML, SCORE_LABEL_HTML,
+    DEMO_BANNER_HTML, WELCOME_CARD_HTML, SCORE_CELL_HTML, STATUS_CARD_HTML,
+    ACHIEVEMENT_BADGE_HTML, ACHIEVEMENT_CARD_HTML, LOCKED_ACHIEVEMENT_CARD_HTML
 )
 
 # AI 語音電話模組（支援真實 Twilio 電話 + Demo 模式）
-try:
-    from voice_call_module import render_voice_call_demo, is_twilio_configured
-    VOICE_CALL_ENABLED = True
-    TWILIO_CONFIGURED = is_twilio_configured()
-except ImportError:
+# Google Sheet 資料庫模組（gspread + google-auth）
+# 兩者皆於首次使用時才匯入，縮短冷啟動時間
+def _module_available(name: str) -> bool:
+    """檢查模組是否已安裝（不實際匯入）"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except ModuleNotFoundError:
+        return False
+
+
+GOOGLE_SHEET_ENABLED = _module_available("gspread") and _module_available("google.oauth2")
+
+
+# app.py 每次重跑都會重新執行，延遲載入的結果以 st.cache_resource 保留於程序中
+@st.cache_resource(show_spinner=False)
+def get_voice_call_renderer():
+    """延遲載入 AI 語音電話渲染函數，未安裝時回傳 None"""
     try:
-        # 向下相容舊版 Demo
-        from voice_call_demo import render_voice_call_demo
-        VOICE_CALL_ENABLED = True
-        TWILIO_CONFIGURED = False
+        from voice_call_module import render_voice_call_demo
     except ImportError:
-        VOICE_CALL_ENABLED = False
-        TWILIO_CONFIGURED = False
+        try:
+            # 向下相容舊版 Demo
+            from voice_call_demo import render_voice_call_demo
+        except ImportError:
+            return None
+    return render_voice_call_demo
+
 
-# Google Sheet 資料庫模組
+# JSON 匯出：優先使用 orjson（原生 UTF-8，大量中文資料較快），未安裝時退回標準 json
 try:
-    from google_sheet_db import (
-        get_patient_manager, get_report_manager, 
-        get_conversation_manager, get_achievement_manager,
-        init_spreadsheet, test_connection
-    )
-    GOOGLE_SHEET_ENABLED = True
+    import orjson
 except ImportError:
-    GOOGLE_SHEET_ENABLED = False
+    orjson = None
 
-# ============================================
-# 頁面配置
-# ============================================
-st.set_page_config(
-    page_title="AI-CARE Lung 照護系統",
-    page_icon="🫁",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
 
-# ============================================
-# 自定義 CSS 樣式
-# ============================================
-st.markdown("""
-<style>
-/* 主題顏色 */
-:root {
-    --primary: #0891b2;
-    --primary-light: #22d3ee;
-    --success: #10b981;
-    --warning: #f59e0b;
-    --danger: #ef4444;
-    --bg-card: #f8fafc;
-    --text-primary: #1e293b;
-    --text-secondary: #64748b;
-}
+def dumps_ndjson(records, preview_size: int = 5) -> tuple:
+    """
+    逐筆序列化為 NDJSON（每行一筆 JSON，UTF-8 bytes）
+    
+    Returns:
+        (前 preview_size 筆資料, NDJSON bytes)
+    """
+    buf = io.BytesIO()
+    preview = []
+    for record in records:
+        if len(preview) < preview_size:
+            preview.append(record)
+        if orjson is not None:
+            buf.write(orjson.dumps(record, option=orjson.OPT_NON_STR_KEYS))
+        else:
+            buf.write(json.dumps(record, ensure_ascii=False).encode("utf-8"))
+        buf.write(b"\n")
+    return preview, buf.getvalue()
 
-/* 隱藏 Streamlit 預設元素 */
-#MainMenu {visibility: hidden;}
-footer {visibility: hidden;}
-header {visibility: hidden;}
 
-/* 主容器 */
-.main .block-container {
-    padding-top: 1rem;
-    padding-bottom: 1rem;
-    max-width: 100%;
-}
+@st.cache_resource(show_spinner=False)
+def _google_sheet_db():
+    """延遲載入 Google Sheet 資料庫模組"""
+    import google_sheet_db
+    return google_sheet_db
 
-/* 歡迎卡片 */
-.welcome-card {
-    background: linear-gradient(135deg, #0891b2 0%, #0e7490 100%);
-    border-radius: 20px;
-    padding: 1.5rem 2rem;
-    color: white;
-    margin-bottom: 1.5rem;
-    box-shadow: 0 10px 40px rgba(8, 145, 178, 0.3);
-}
 
-.welcome-card h2 {
-    margin: 0 0 0.5rem 0;
-    font-size: 1.5rem;
-    font-weight: 600;
-}
+def get_patient_manager():
+    """取得病人管理器（延遲載入）"""
+    return _google_sheet_db().get_patient_manager()
 
-.welcome-card p {
-    margin: 0;
-    opacity: 0.9;
-    font-size: 0.95rem;
-}
 
-/* 狀態卡片 */
-.status-card {
-    background: white;
-    border-radius: 16px;
-    padding: 1.25rem;
-    box-shadow: 0 2px 12px rgba(0,0,0,0.06);
-    border: 1px solid #e2e8f0;
-    text-align: center;
-    transition: transform 0.2s, box-shadow 0.2s;
-}
+def get_report_manager():
+    """取得回報管理器（延遲載入）"""
+    return _google_sheet_db().get_report_manager()
 
-.status-card:hover {
-    transform: translateY(-2px);
-    box-shadow: 0 8px 24px rgba(0,0,0,0.1);
-}
 
-.status-icon {
-    font-size: 2rem;
-    margin-bottom: 0.5rem;
-}
+def get_conversation_manager():
+    """取得對話管理器（延遲載入）"""
+    return _google_sheet_db().get_conversation_manager()
 
-.status-value {
-    font-size: 1.75rem;
-    font-weight: 700;
-    color: #1e293b;
-    margin: 0.25rem 0;
-}
 
-.status-label {
-    font-size: 0.85rem;
-    color: #64748b;
-}
+def get_achievement_manager():
+    """取得成就管理器（延遲載入）"""
+    return _google_sheet_db().get_achievement_manager()
 
-/* 回報按鈕 */
-.report-button {
-    background: linear-gradient(135deg, #10b981 0%, #059669 100%);
-    border-radius: 16px;
-    padding: 1.5rem;
-    color: white;
-    text-align: center;
-    cursor: pointer;
-    transition: all 0.3s;
-    box-shadow: 0 8px 24px rgba(16, 185, 129, 0.3);
-    margin: 1rem 0;
-}
 
-.report-button:hover {
-    transform: scale(1.02);
-    box-shadow: 0 12px 32px rgba(16, 185, 129, 0.4);
-}
+def check_connection() -> bool:
+    """檢查 Google Sheets 連線（延遲載入）"""
+    return _google_sheet_db().check_connection()
 
-.report-button-disabled {
-    background: linear-gradient(135deg, #94a3b8 0%, #64748b 100%);
-    box-shadow: none;
-}
 
-/* 對話氣泡 */
-.chat-bubble {
-    padding: 1rem 1.25rem;
-    border-radius: 16px;
-    margin: 0.5rem 0;
-    max-width: 85%;
-    line-height: 1.5;
-}
+# 病人資料快取（60 秒；提交回報後以 clear_patient_cache 清除）
+@st.cache_data(ttl=60, show_spinner=False)
+def load_compliance_stats(patient_id: str, surgery_date: date) -> Compliance:
+    """取得順從度統計（快取）"""
+    return get_report_manager().get_compliance_stats(patient_id, surgery_date)
 
-.chat-assistant {
-    background: linear-gradient(135deg, #f0f9ff 0%, #e0f2fe 100%);
-    border: 1px solid #bae6fd;
-    margin-right: auto;
-}
 
-.chat-user {
-    background: linear-gradient(135deg, #0891b2 0%, #0e7490 100%);
-    color: white;
-    margin-left: auto;
-}
+@st.cache_data(ttl=60, show_spinner=False)
+def load_today_report(patient_id: str):
+    """取得今日回報（快取）"""
+    return get_report_manager().get_today_report(patient_id)
 
-/* 開放式問題區 */
-.open-question-card {
-    background: linear-gradient(135deg, #fef3c7 0%, #fde68a 100%);
-    border: 2px solid #f59e0b;
-    border-radius: 16px;
-    padding: 1.5rem;
-    margin: 1rem 0;
-}
 
-.open-question-title {
-    color: #92400e;
-    font-weight: 600;
-    margin-bottom: 0.5rem;
-}
+@st.cache_data(ttl=60, show_spinner=False)
+def load_achievements_status(patient_id: str) -> list:
+    """取得所有成就狀態（快取）"""
+    return get_achievement_manager().get_all_achievements_status(patient_id)
 
-.open-question-hint {
-    color: #b45309;
-    font-size: 0.85rem;
-    opacity: 0.8;
-}
 
-/* 資料收集提示 */
-.data-notice {
-    background: #f0fdf4;
-    border: 1px solid #86efac;
-    border-radius: 12px;
-    padding: 1rem;
-    font-size: 0.85rem;
-    color: #166534;
-    margin: 1rem 0;
-}
+# 版本號在每則訊息儲存時遞增，只保留最新版本的匯出結果
+@st.cache_data(max_entries=1, show_spinner=False)
+def load_annotation_export(version: int) -> tuple:
+    """
+    匯出標註資料（快取，以對話儲存版本號為鍵）
+    
+    Returns:
+        (預覽資料, NDJSON bytes)
+    """
+    return dumps_ndjson(conversation_store.iter_annotation_records())
 
-/* 登入卡片 */
-.login-card {
-    background: white;
-    border-radius: 20px;
-    padding: 2rem;
-    box-shadow: 0 10px 40px rgba(0,0,0,0.1);
-    max-width: 400px;
-    margin: 2rem auto;
-}
 
-.login-header {
-    text-align: center;
-    margin-bottom: 2rem;
-}
+@st.cache_data(max_entries=1, show_spinner=False)
+def load_open_ended_export(version: int) -> tuple:
+    """匯出開放式回應（快取，以對話儲存版本號為鍵）"""
+    return dumps_ndjson(conversation_store.iter_open_ended_records())
 
-.login-header h1 {
-    color: #0891b2;
-    margin: 0.5rem 0;
-}
-</style>
-""", unsafe_allow_html=True)
+
+def load_patient_dashboard(patient_id: str, surgery_date: date) -> tuple:
+    """
+    平行載入登入後所需資料
+    
+    Returns:
+        (compliance, today_report, achievements)
+    """
+    ctx = get_script_run_ctx()
+    
+    def _attach_ctx():
+        # 讓工作執行緒可以使用 st.* （例如錯誤訊息）
+        add_script_run_ctx(threading.current_thread(), ctx)
+    
+    with ThreadPoolExecutor(max_workers=3, initializer=_attach_ctx) as executor:
+        compliance = executor.submit(load_compliance_stats, patient_id, surgery_date)
+        today_report = executor.submit(load_today_report, patient_id)
+        achievements = executor.submit(load_achievements_status, patient_id)
+        return compliance.result(), today_report.result(), achievements.result()
+
+
+def clear_patient_cache():
+    """清除病人資料快取"""
+    load_compliance_stats.clear()
+    load_today_report.clear()
+    load_achievements_status.clear()
+
+
+@st.cache_resource
+def get_background_executor() -> ThreadPoolExecutor:
+    """背景執行緒池（提交後的成就檢查等非關鍵雲端寫入）"""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="aicare-bg")
+
+
+def start_achievement_check(patient_id: str, compliance: Compliance):
+    """於背景檢查並解鎖成就，結果由 apply_achievement_check 於下次重跑時套用"""
+    am = get_achievement_manager()
+    
+    def _check():
+        new_achievements = am.check_and_unlock(patient_id, compliance)
+        return new_achievements, am.get_all_achievements_status(patient_id)
+    
+    st.session_state.pending_achievements = get_background_executor().submit(_check)
+
+
+def apply_achievement_check():
+    """套用背景成就檢查結果（尚未完成則留待下次重跑）"""
+    future = st.session_state.pending_achievements
+    if future is None or not future.done():
+        return
+    
+    st.session_state.pending_achievements = None
+    try:
+        new_achievements, achievements = future.result()
+    except Exception as e:
+        st.warning(f"成就更新失敗: {e}")
+        return
+    
+    if new_achievements:
+        for ach in new_achievements:
+            st.toast(f"🎉 獲得新成就：{ach['icon']} {ach['name']}！")
+        st.balloons()
+    
+    load_achievements_status.clear()
+    set_achievements(achievements)
 
 # ============================================
-# 症狀定義
+# 頁面配置
 # ============================================
-SYMPTOMS = [
-    {"id": "pain", "name": "疼痛", "icon": "🩹", "question": "今天傷口或胸部的疼痛程度如何？"},
-    {"id": "fatigue", "name": "疲勞", "icon": "😮‍💨", "question": "今天感覺疲勞或虛弱嗎？"},
-    {"id": "dyspnea", "name": "呼吸困難", "icon": "💨", "question": "今天呼吸順暢嗎？有沒有喘或胸悶？"},
-    {"id": "cough", "name": "咳嗽", "icon": "🤧", "question": "今天咳嗽的情況如何？"},
-    {"id": "sleep", "name": "睡眠", "icon": "😴", "question": "昨晚睡得好嗎？"},
-    {"id": "appetite", "name": "食慾", "icon": "🍽️", "question": "今天胃口怎麼樣？"},
-    {"id": "mood", "name": "心情", "icon": "💭", "question": "今天心情如何？有沒有焦慮或擔心？"}
-]
-
-SCORE_OPTIONS = {
-    0: {"label": "完全沒有", "color": "#10b981"},
-    1: {"label": "非常輕微", "color": "#22c55e"},
-    2: {"label": "輕微", "color": "#84cc16"},
-    3: {"label": "輕度", "color": "#a3e635"},
-    4: {"label": "中等偏輕", "color": "#facc15"},
-    5: {"label": "中等", "color": "#fbbf24"},
-    6: {"label": "中等偏重", "color": "#f59e0b"},
-    7: {"label": "明顯", "color": "#fb923c"},
-    8: {"label": "嚴重", "color": "#f97316"},
-    9: {"label": "非常嚴重", "color": "#ef4444"},
-    10: {"label": "極度嚴重", "color": "#dc2626"}
-}
+st.set_page_config(
+    page_title="AI-CARE Lung 照護系統",
+    page_icon="🫁",
+    layout="wide",
+    initial_sidebar_state="expanded"
+)
+
+# ============================================
+# 自定義 CSS 樣式
+# ============================================
+CSS_PATH = Path(__file__).parent / "static" / "app.css"
+
+
+@st.cache_resource
+def load_app_css() -> str:
+    """讀取 static/app.css（每個程序只讀一次）"""
+    return f"<style>\n{CSS_PATH.read_text(encoding='utf-8')}</style>"
+
+
+# Streamlit 每次重跑都會清掉未重新輸出的元素，因此樣式仍需每次輸出
+st.markdown(load_app_css(), unsafe_allow_html=True)
 
 # ============================================
 # Session State 初始化
@@ -293,20 +284,50 @@ def init_session_state():
         st.session_state.logged_in = False
         st.session_state.patient = None
         st.session_state.compliance = None
+        st.session_state.completion_rate = 0
         st.session_state.today_reported = False
         st.session_state.achievements = []
+        st.session_state.unlocked_achievements = []
         st.session_state.report_history = {}
         st.session_state.chat_messages = []
+        st.session_state.chat_show_all = False
+        st.session_state.chat_blocks = None
         st.session_state.current_symptom_index = 0
         st.session_state.current_scores = {}
         st.session_state.current_descriptions = {}
-        st.session_state.open_ended_responses = []
+        st.session_state.open_ended_responses = {}
         st.session_state.conversation_session_id = None
+        st.session_state.pending_achievements = None
         st.session_state.use_demo_mode = False
 
 init_session_state()
 
 
+def recompute_derived_state():
+    """重新計算衍生欄位（術後天數、完成率），於病人或順從度資料變動時呼叫"""
+    patient = st.session_state.patient
+    compliance = st.session_state.compliance
+    
+    patient.post_op_day = (date.today() - patient.surgery_date).days
+    st.session_state.completion_rate = (
+        compliance.total_completed / compliance.total_days * 100
+        if compliance.total_days > 0 else 0
+    )
+
+
+# 導航按鈕使用 on_click 回呼：狀態在重新執行前就已更新，
+# 點擊只會觸發一次執行，不需要再呼叫 st.rerun()
+def go_to_page(page: str):
+    """切換頁面"""
+    st.session_state.current_page = page
+
+
+def set_achievements(achievements: list):
+    """更新成就列表，並預先分出已解鎖的成就"""
+    st.session_state.achievements = achievements
+    st.session_state.unlocked_achievements = [a for a in achievements if a.get("unlocked")]
+
+
 # ============================================
 # 登入/註冊頁面
 # ============================================
@@ -320,14 +341,14 @@ def render_login():
     </div>
     """, unsafe_allow_html=True)
     
-    # 檢查 Google Sheet 連線狀態
+    # 檢查 Google Sheet 連線狀態（每個 session 最多 30 秒檢查一次）
     if GOOGLE_SHEET_ENABLED:
-        try:
-            # 嘗試連線
-            pm = get_patient_manager()
-            connection_ok = pm.spreadsheet is not None
-        except:
-            connection_ok = False
+        now = time.time()
+        if ("connection_ok" not in st.session_state
+                or now - st.session_state.connection_checked_at > 30):
+            st.session_state.connection_ok = check_connection()
+            st.session_state.connection_checked_at = now
+        connection_ok = st.session_state.connection_ok
     else:
         connection_ok = False
     
@@ -373,7 +394,7 @@ def render_login_form(connection_ok: bool):
     
     if submitted:
         if not patient_id or not password:
-            st.error("請填寫病歷號碼和密碼")
+            st.error("❌ 請填寫病歷號碼和密碼")
             return
         
         if connection_ok:
@@ -387,20 +408,15 @@ def render_login_form(connection_ok: bool):
                 st.session_state.patient = patient_data
                 st.session_state.use_demo_mode = False
                 
-                # 載入順從度資料
-                rm = get_report_manager()
-                st.session_state.compliance = rm.get_compliance_stats(
-                    patient_id, 
-                    patient_data["surgery_date"]
+                # 平行載入順從度、今日回報、成就
+                compliance, today_report, achievements = load_patient_dashboard(
+                    patient_id,
+                    patient_data.surgery_date
                 )
-                
-                # 檢查今日是否已回報
-                today_report = rm.get_today_report(patient_id)
+                st.session_state.compliance = compliance
                 st.session_state.today_reported = today_report is not None
-                
-                # 載入成就
-                am = get_achievement_manager()
-                st.session_state.achievements = am.get_all_achievements_status(patient_id)
+                set_achievements(achievements)
+                recompute_derived_state()
                 
                 st.session_state.current_page = "home"
                 st.success("✅ 登入成功！")
@@ -485,12 +501,11 @@ def render_register_form(connection_ok: bool):
             errors.append("請同意個人資料使用同意書")
         
         if errors:
-            for error in errors:
-                st.error(f"❌ {error}")
+            st.error("\n\n".join(f"❌ {error}" for error in errors))
             return
         
         # 計算年齡
-        age = (date.today() - birthday).days // 365
+        age = calculate_age(birthday)
         
         # 註冊
         pm = get_patient_manager()
@@ -532,38 +547,40 @@ def render_demo_mode():
         st.session_state.use_demo_mode = True
         
         # 模擬病人資料
-        st.session_state.patient = {
-            "id": "DEMO001",
-            "name": "王先生",
-            "gender": "男",
-            "age": 62,
-            "surgery_date": (datetime.now() - timedelta(days=14)).date(),
-            "post_op_day": 14,
-            "surgery_type": "胸腔鏡右上肺葉切除術",
-            "cancer_stage": "IA"
-        }
+        st.session_state.patient = PatientProfile(
+            id="DEMO001",
+            name="王先生",
+            gender="男",
+            age=62,
+            surgery_date=(datetime.now() - timedelta(days=14)).date(),
+            post_op_day=14,
+            surgery_type="胸腔鏡右上肺葉切除術",
+            cancer_stage="IA"
+        )
         
         # 模擬順從度
-        st.session_state.compliance = {
-            "current_streak": 7,
-            "best_streak": 12,
-            "total_completed": 12,
-            "total_days": 14,
-            "points": 180,
-            "level": 3
-        }
+        st.session_state.compliance = Compliance(
+            current_streak=7,
+            best_streak=12,
+            total_completed=12,
+            total_days=14,
+            points=180,
+            level=3
+        )
         
         st.session_state.today_reported = False
         
         # 模擬成就
-        st.session_state.achievements = [
+        set_achievements([
             {"id": "first_report", "name": "初次回報", "icon": "🌟", "unlocked": True, "date": "2024-12-15"},
             {"id": "streak_3", "name": "連續3天", "icon": "🌱", "unlocked": True, "date": "2024-12-18"},
             {"id": "streak_7", "name": "連續7天", "icon": "🔥", "unlocked": True, "date": "2024-12-22"},
             {"id": "streak_14", "name": "連續14天", "icon": "⭐", "unlocked": False, "date": None},
             {"id": "streak_21", "name": "連續21天", "icon": "🏅", "unlocked": False, "date": None},
             {"id": "first_description", "name": "詳細描述者", "icon": "✍️", "unlocked": False, "date": None},
-        ]
+        ])
+        
+        recompute_derived_state()
         
         st.session_state.current_page = "home"
         st.rerun()
@@ -577,62 +594,17 @@ def render_home():
     patient = st.session_state.patient
     compliance = st.session_state.compliance
     
-    # Demo 模式提示
-    if st.session_state.use_demo_mode:
-        st.markdown("""
-        <div style="background: #fef3c7; border: 1px solid #f59e0b; border-radius: 8px; 
-                    padding: 0.5rem 1rem; margin-bottom: 1rem; font-size: 0.85rem;">
-            🎮 <strong>Demo 模式</strong> - 資料不會儲存，僅供體驗
-        </div>
-        """, unsafe_allow_html=True)
-    
-    # 歡迎卡片
-    st.markdown(f"""
-    <div class="welcome-card">
-        <h2>👋 {patient['name']}，您好！</h2>
-        <p>今天是術後第 {patient['post_op_day']} 天 | {patient['surgery_type']}</p>
-    </div>
-    """, unsafe_allow_html=True)
+    # Demo 模式提示 + 歡迎卡片（合併為一次輸出）
+    header_html = DEMO_BANNER_HTML if st.session_state.use_demo_mode else ""
+    header_html += WELCOME_CARD_HTML.format(
+        name=patient.name,
+        post_op_day=patient.post_op_day,
+        surgery_type=patient.surgery_type
+    )
+    st.markdown(header_html, unsafe_allow_html=True)
     
     # 狀態卡片
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        st.markdown(f"""
-        <div class="status-card">
-            <div class="status-icon">🔥</div>
-            <div class="status-value">{compliance['current_streak']}</div>
-            <div class="status-label">連續完成天數</div>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col2:
-        rate = (compliance['total_completed'] / compliance['total_days'] * 100) if compliance['total_days'] > 0 else 0
-        st.markdown(f"""
-        <div class="status-card">
-            <div class="status-icon">📊</div>
-            <div class="status-value">{rate:.0f}%</div>
-            <div class="status-label">總完成率</div>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col3:
-        st.markdown(f"""
-        <div class="status-card">
-            <div class="status-icon">⭐</div>
-            <div class="status-value">{compliance['points']}</div>
-            <div class="status-label">累積積分</div>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col4:
-        st.markdown(f"""
-        <div class="status-card">
-            <div class="status-icon">🏆</div>
-            <div class="status-value">Lv.{compliance['level']}</div>
-            <div class="status-label">等級</div>
-        </div>
-        """, unsafe_allow_html=True)
+    render_status_cards(compliance, st.session_state.completion_rate)
     
     st.markdown("---")
     
@@ -648,29 +620,29 @@ def render_home():
         col1, col2, col3 = st.columns(3)
         with col1:
             if st.button("💬 AI 對話回報", use_container_width=True, type="primary"):
-                # 開始新的對話會話
-                session = conversation_store.start_session(
-                    patient_id=st.session_state.patient["id"],
+                # 開始今日對話會話（已有未結束的會話則沿用）
+                session = conversation_store.get_or_start_session(
+                    patient_id=st.session_state.patient.id,
                     session_type="daily_report"
                 )
                 st.session_state.conversation_session_id = session.session_id
                 st.session_state.current_page = "ai_chat"
                 st.session_state.chat_messages = []
+                st.session_state.chat_show_all = False
+                st.session_state.chat_blocks = None
                 st.session_state.current_symptom_index = 0
                 st.session_state.current_scores = {}
                 st.session_state.current_descriptions = {}
-                st.session_state.open_ended_responses = []
+                st.session_state.open_ended_responses = {}
                 st.rerun()
         
         with col2:
-            if st.button("📋 數位問卷回報", use_container_width=True):
-                st.session_state.current_page = "questionnaire"
-                st.rerun()
+            st.button("📋 數位問卷回報", use_container_width=True,
+                      on_click=go_to_page, args=("questionnaire",))
         
         with col3:
-            if st.button("📞 AI 語音電話", use_container_width=True):
-                st.session_state.current_page = "voice_call"
-                st.rerun()
+            st.button("📞 AI 語音電話", use_container_width=True,
+                      on_click=go_to_page, args=("voice_call",))
         
         # AI 語音電話說明
         st.markdown("""
@@ -688,26 +660,59 @@ def render_home():
         """, unsafe_allow_html=True)
     
     # 成就展示
+    render_home_achievements(st.session_state.unlocked_achievements)
+
+
+def render_status_cards(compliance: Compliance, rate: float):
+    """渲染首頁狀態卡片（合併為單一元素輸出）"""
+    status_cards = "".join(
+        STATUS_CARD_HTML.format(icon=icon, value=value, label=label)
+        for icon, value, label in (
+            ("🔥", compliance.current_streak, "連續完成天數"),
+            ("📊", f"{rate:.0f}%", "總完成率"),
+            ("⭐", compliance.points, "累積積分"),
+            ("🏆", f"Lv.{compliance.level}", "等級"),
+        )
+    )
+    st.markdown(f'<div class="status-grid">{status_cards}</div>', unsafe_allow_html=True)
+
+
+def render_home_achievements(unlocked: list):
+    """渲染首頁成就徽章（僅傳入已解鎖的成就）"""
     st.markdown("### 🎖️ 我的成就")
-    unlocked = [a for a in st.session_state.achievements if a.get("unlocked")]
     if unlocked:
-        cols = st.columns(len(unlocked))
-        for i, achievement in enumerate(unlocked):
-            with cols[i]:
-                st.markdown(f"""
-                <div style="text-align: center; padding: 0.5rem;">
-                    <div style="font-size: 2rem;">{achievement['icon']}</div>
-                    <div style="font-size: 0.8rem; color: #64748b;">{achievement['name']}</div>
-                </div>
-                """, unsafe_allow_html=True)
+        badges = "".join(
+            ACHIEVEMENT_BADGE_HTML.format(icon=a['icon'], name=a['name'])
+            for a in unlocked
+        )
+        st.markdown(f'<div class="achievement-strip">{badges}</div>', unsafe_allow_html=True)
 
 
 # ============================================
 # AI 對話回報（更新版）
 # ============================================
 def render_ai_chat():
-    """渲染 AI 對話回報頁面（更新版：支援資料收集）"""
+    """
+    渲染 AI 對話回報頁面（更新版：支援資料收集）
     
+    對話內容以片段執行；文字輸入框放在片段外，才會固定在頁面底部
+    """
+    render_chat_panel()
+    
+    # 文字輸入（同時收集分數和描述）
+    current_idx = st.session_state.current_symptom_index
+    if current_idx < N_SYMPTOMS:
+        user_input = st.chat_input("輸入分數（0-10）或描述您的感受...")
+        
+        if user_input:
+            handle_text_input(user_input, SYMPTOMS[current_idx])
+
+
+@st.fragment
+def render_chat_panel():
+    """
+    對話內容片段：對話中的操作只重跑本區；離開頁面時需明確以 scope="app" 重跑
+    """
     st.markdown("### 💬 AI 對話回報")
     st.markdown("與 AI 助手對話，輕鬆完成今日症狀回報")
     
@@ -728,7 +733,7 @@ def render_ai_chat():
                 completion_type="abandoned"
             )
         st.session_state.current_page = "home"
-        st.rerun()
+        st.rerun(scope="app")
     
     st.markdown("---")
     
@@ -738,8 +743,8 @@ def render_ai_chat():
         
         # 嘗試使用專家範本
         context = {
-            "patient_name": patient['name'],
-            "post_op_day": patient['post_op_day']
+            "patient_name": patient.name,
+            "post_op_day": patient.post_op_day
         }
         
         welcome_msg, template_id, source = get_expert_response(
@@ -750,9 +755,9 @@ def render_ai_chat():
         if not welcome_msg:
             # 使用預設歡迎訊息
             welcome_msg = f"""
-{patient['name']}您好！我是您的 AI 照護助手 🤖
+{patient.name}您好！我是您的 AI 照護助手 🤖
 
-今天是術後第 **{patient['post_op_day']} 天**，讓我們一起完成今日的症狀回報吧！
+今天是術後第 **{patient.post_op_day} 天**，讓我們一起完成今日的症狀回報吧！
 
 整個過程大約 2-3 分鐘，我會依序詢問您 7 個症狀的狀況。
 
@@ -761,118 +766,136 @@ def render_ai_chat():
         
         # 記錄 AI 訊息
         log_ai_response(
-            patient_id=patient["id"],
+            patient_id=patient.id,
             content=welcome_msg,
             source=source if source else MessageSource.AI_GENERATED,
             template_id=template_id
         )
         
-        st.session_state.chat_messages.append({
-            "role": "assistant",
-            "content": welcome_msg,
-            "source": source.value if source else "ai_generated",
-            "template_id": template_id
-        })
+        add_chat_message(
+            "assistant",
+            welcome_msg,
+            source=source.value if source else "ai_generated",
+            template_id=template_id
+        )
         
         # 第一個問題
-        symptom = SYMPTOMS[0]
-        first_question = f"""
-**{symptom['icon']} {symptom['name']}評估**
-
-{symptom['question']}
-
-請選擇 0-10 分：
-- 0 分：完全沒有
-- 1-3 分：輕微
-- 4-6 分：中等
-- 7-10 分：嚴重
-
-💡 您也可以用文字描述症狀的感覺！
-"""
-        
+        first_question = FIRST_QUESTION_MD
         log_ai_response(
-            patient_id=patient["id"],
+            patient_id=patient.id,
             content=first_question,
             source=MessageSource.SYSTEM_AUTO
         )
         
-        st.session_state.chat_messages.append({
-            "role": "assistant",
-            "content": first_question,
-            "source": "system_auto"
-        })
+        add_chat_message(
+            "assistant",
+            first_question,
+            source="system_auto"
+        )
     
     # 顯示對話歷史
-    chat_container = st.container()
-    with chat_container:
-        for msg in st.session_state.chat_messages:
-            if msg["role"] == "assistant":
-                # 顯示訊息來源標籤
-                source_label = ""
-                if msg.get("source") == "expert_template":
-                    source_label = " 🏥"
-                
-                st.markdown(f"""
-                <div class="chat-bubble chat-assistant">
-                    {msg['content'].replace(chr(10), '<br>')}{source_label}
-                </div>
-                """, unsafe_allow_html=True)
-            else:
-                st.markdown(f"""
-                <div class="chat-bubble chat-user">
-                    {msg['content']}
-                </div>
-                """, unsafe_allow_html=True)
+    render_chat_history()
     
     # 檢查是否完成所有症狀
     current_idx = st.session_state.current_symptom_index
     
-    if current_idx < len(SYMPTOMS):
-        current_symptom = SYMPTOMS[current_idx]
-        
+    if current_idx < N_SYMPTOMS:
         # 快速回覆按鈕
-        st.markdown("**請選擇分數：**")
-        
-        cols = st.columns(6)
-        scores_row1 = [0, 1, 2, 3, 4, 5]
-        scores_row2 = [6, 7, 8, 9, 10]
-        
-        for i, score in enumerate(scores_row1):
-            with cols[i]:
-                if st.button(f"{score}", key=f"score_{score}", use_container_width=True):
-                    handle_score_selection(score, input_method="button")
-        
-        cols2 = st.columns(6)
-        for i, score in enumerate(scores_row2):
-            with cols2[i]:
-                if st.button(f"{score}", key=f"score_{score}_2", use_container_width=True):
-                    handle_score_selection(score, input_method="button")
+        score = st.segmented_control(
+            "**請選擇分數：**",
+            options=SCORE_CHOICES,
+            key=f"score_seg_{current_idx}"
+        )
+        if score is not None:
+            handle_score_selection(score, input_method="button")
         
-        # 文字輸入（同時收集分數和描述）
+        # 文字輸入框由 render_ai_chat 放在頁面底部
         st.markdown("---")
         st.markdown("**或用文字回答：**")
-        user_input = st.chat_input("輸入分數（0-10）或描述您的感受...")
-        
-        if user_input:
-            handle_text_input(user_input, current_symptom)
     
-    elif current_idx == len(SYMPTOMS):
+    elif current_idx == N_SYMPTOMS:
         # 症狀回報完成，詢問開放式問題
         render_open_ended_questions()
     
-    else:
+    elif st.session_state.current_scores:
         # 所有問題已完成
         if st.button("✅ 確認提交回報", type="primary", use_container_width=True):
             submit_report()
+    
+    else:
+        # 已提交（分數已移交至歷史紀錄）
+        st.success("✅ 今日回報已提交")
+
+
+_MARKDOWN_SPECIAL_RE = re.compile(r'([\\`*_{}\[\]()#+\-.!|>~<])')
+
+
+def escape_markdown(text: str) -> str:
+    """跳脫 Markdown 符號並保留換行（病人輸入原樣顯示）"""
+    return _MARKDOWN_SPECIAL_RE.sub(r'\\\1', text).replace("\n", "  \n")
+
+
+def add_chat_message(role: str, content: str, **fields):
+    """新增對話訊息，並於加入時產生顯示用文字（重跑時不再重算）"""
+    msg = {"role": role, "content": content, **fields}
+    if role == "user":
+        msg["display"] = escape_markdown(content)
+    elif fields.get("source") == "expert_template":
+        # 專家範本回應加上來源標籤
+        msg["display"] = f"{content} 🏥"
+    else:
+        msg["display"] = content
+    st.session_state.chat_messages.append(msg)
+
+
+def rerun_chat():
+    """重跑對話片段（若目前是整頁執行則重跑整頁）"""
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+
+def render_chat_history():
+    """顯示對話歷史（預設只顯示最近 CHAT_TAIL 則，較早的訊息需展開）"""
+    messages = st.session_state.chat_messages
+    hidden = 0 if st.session_state.chat_show_all else max(0, len(messages) - CHAT_TAIL)
+    
+    if hidden and st.button(f"⬆️ 顯示較早的 {hidden} 則訊息", key="load_earlier_messages"):
+        st.session_state.chat_show_all = True
+        hidden = 0
+    
+    for role, text in chat_history_blocks(messages, hidden):
+        with st.chat_message(role, avatar=CHAT_AVATARS[role]):
+            st.markdown(text)
+
+
+def chat_history_blocks(messages: list, start: int) -> list:
+    """
+    同一角色的連續訊息合併為一個顯示區塊
+    
+    訊息數與起點未變時（例如輸入開放式問題造成的重跑）直接沿用上次結果
+    """
+    key = (len(messages), start)
+    cached = st.session_state.chat_blocks
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    
+    blocks = [
+        (role, "\n\n".join(msg["display"] for msg in group))
+        for role, group in itertools.groupby(messages[start:], key=lambda m: m["role"])
+    ]
+    st.session_state.chat_blocks = (key, blocks)
+    return blocks
 
 
-def handle_text_input(user_input: str, current_symptom: dict):
+def handle_text_input(user_input: str, current_symptom: Symptom):
     """
     處理病人文字輸入
     
     這是收集自然語言資料的關鍵點
     """
-    patient_id = st.session_state.patient["id"]
+    patient_id = st.session_state.patient.id
     
     # 記錄原始輸入（最重要！）
     log_patient_input(
@@ -892,24 +915,17 @@ def handle_text_input(user_input: str, current_symptom: dict):
         
         if description:
             # 儲存症狀描述
-            st.session_state.current_descriptions[current_symptom["id"]] = description
+            st.session_state.current_descriptions[current_symptom.id] = description
         
         handle_score_selection(score, input_method="text", raw_input=user_input)
     else:
         # 輸入是純文字描述，詢問分數
-        st.session_state.current_descriptions[current_symptom["id"]] = user_input
+        st.session_state.current_descriptions[current_symptom.id] = user_input
         
-        st.session_state.chat_messages.append({
-            "role": "user",
-            "content": user_input
-        })
+        add_chat_message("user", user_input)
         
         # 感謝描述並詢問分數
-        response = f"""
-謝謝您的描述！這對我們了解您的狀況很有幫助。
-
-請問以 0-10 分來說，您今天的{current_symptom['name']}大約是幾分呢？
-"""
+        response = ASK_SCORE_MD.format(name=current_symptom.name)
         
         log_ai_response(
             patient_id=patient_id,
@@ -917,53 +933,53 @@ def handle_text_input(user_input: str, current_symptom: dict):
             source=MessageSource.SYSTEM_AUTO
         )
         
-        st.session_state.chat_messages.append({
-            "role": "assistant",
-            "content": response,
-            "source": "system_auto"
-        })
+        add_chat_message(
+            "assistant",
+            response,
+            source="system_auto"
+        )
         
-        st.rerun()
+        rerun_chat()
+
+
+_SCORE_RE = re.compile(r'\d+')
+_SCORE_STRIP_RE = re.compile(r'\d+\s*分?')
+
+# 文字描述 → 分數（順序即優先順序，例如「沒有很痛」判為 0 分）
+_KEYWORD_SCORES = tuple(
+    (keyword, score)
+    for keywords, score in (
+        (("沒有", "完全沒有", "零", "不會"), 0),
+        (("非常嚴重", "極度", "劇烈"), 9),
+        (("很嚴重", "嚴重"), 8),
+        (("明顯", "很痛", "很喘", "很累"), 7),
+        (("中等", "普通", "還好"), 5),
+        (("輕微", "一點點", "有點"), 2),
+    )
+    for keyword in keywords
+)
 
 
 def parse_score_from_text(text: str) -> int:
     """從文字中解析分數"""
-    import re
-    
-    # 嘗試找數字
-    numbers = re.findall(r'\d+', text)
-    
-    if numbers:
-        for num_str in numbers:
-            num = int(num_str)
-            if 0 <= num <= 10:
-                return num
-    
-    # 嘗試解析文字描述
-    text_lower = text.lower()
-    
-    if any(kw in text for kw in ["沒有", "完全沒有", "零", "不會"]):
-        return 0
-    elif any(kw in text for kw in ["非常嚴重", "極度", "劇烈"]):
-        return 9
-    elif any(kw in text for kw in ["很嚴重", "嚴重"]):
-        return 8
-    elif any(kw in text for kw in ["明顯", "很痛", "很喘", "很累"]):
-        return 7
-    elif any(kw in text for kw in ["中等", "普通", "還好"]):
-        return 5
-    elif any(kw in text for kw in ["輕微", "一點點", "有點"]):
-        return 2
+    # 嘗試找 0-10 的數字（忽略「14 天」這類超出範圍的數字；\d 也涵蓋全形數字）
+    for number in _SCORE_RE.findall(text):
+        value = int(number)
+        if 0 <= value <= 10:
+            return value
+    
+    # 嘗試解析文字描述（依優先順序比對，先符合者為準）
+    for keyword, score in _KEYWORD_SCORES:
+        if keyword in text:
+            return score
     
     return None
 
 
 def extract_description(text: str, score: int) -> str:
     """從輸入中提取描述部分（排除分數）"""
-    import re
-    
     # 移除數字和「分」字
-    description = re.sub(r'\d+\s*分?', '', text).strip()
+    description = _SCORE_STRIP_RE.sub('', text).strip()
     
     # 移除常見的非描述性詞
     remove_words = ["是", "的", "了", "吧", "呢", "啊"]
@@ -978,7 +994,7 @@ def handle_score_selection(score: int, input_method: str = "button", raw_input:
     """處理分數選擇（更新版）"""
     current_idx = st.session_state.current_symptom_index
     symptom = SYMPTOMS[current_idx]
-    patient_id = st.session_state.patient["id"]
+    patient_id = st.session_state.patient.id
     
     # 記錄用戶回覆
     user_content = f"{score} 分"
@@ -993,18 +1009,15 @@ def handle_score_selection(score: int, input_method: str = "button", raw_input:
             input_method="button"
         )
     
-    st.session_state.chat_messages.append({
-        "role": "user",
-        "content": user_content
-    })
+    add_chat_message("user", user_content)
     
     # 儲存分數
-    st.session_state.current_scores[symptom["id"]] = score
+    st.session_state.current_scores[symptom.id] = score
     
     # 生成回應 - 優先使用專家範本
     context = {"score": score}
     response, template_id, source = get_symptom_response(
-        symptom_type=symptom["id"],
+        symptom_type=symptom.id,
         score=score,
         context=context
     )
@@ -1020,45 +1033,28 @@ def handle_score_selection(score: int, input_method: str = "button", raw_input:
         else:
             feedback = "⚠️ 這個症狀比較明顯，個管師會特別關注您的狀況。"
         
-        response = f"收到！{symptom['name']}：**{score} 分**（{option['label']}）\n\n{feedback}"
+        response = f"收到！{symptom.name}：**{score} 分**（{option.label}）\n\n{feedback}"
         source = MessageSource.AI_GENERATED
     
     # 檢查是否有描述
-    if symptom["id"] in st.session_state.current_descriptions:
-        description = st.session_state.current_descriptions[symptom["id"]]
+    if symptom.id in st.session_state.current_descriptions:
+        description = st.session_state.current_descriptions[symptom.id]
         response += f"\n\n（已記錄您的描述：「{description[:50]}...」）" if len(description) > 50 else f"\n\n（已記錄您的描述：「{description}」）"
     
     # 下一個症狀
     next_idx = current_idx + 1
     st.session_state.current_symptom_index = next_idx
     
-    if next_idx < len(SYMPTOMS):
-        next_symptom = SYMPTOMS[next_idx]
-        response += f"""
-
----
-
-**{next_symptom['icon']} {next_symptom['name']}評估**
-
-{next_symptom['question']}
-
-💡 您也可以用文字描述症狀的感覺！
-"""
+    if next_idx < N_SYMPTOMS:
+        response += NEXT_QUESTION_MD[SYMPTOMS[next_idx].id]
     else:
         # 完成所有症狀
-        response += f"""
-
----
-
-🎉 **太棒了！您已完成所有症狀評分！**
-
-以下是今日的回報摘要：
-"""
+        response += SUMMARY_HEADER_MD
         for s in SYMPTOMS:
-            s_score = st.session_state.current_scores.get(s["id"], 0)
-            desc = st.session_state.current_descriptions.get(s["id"], "")
+            s_score = st.session_state.current_scores.get(s.id, 0)
+            desc = st.session_state.current_descriptions.get(s.id, "")
             desc_text = f" ({desc[:20]}...)" if len(desc) > 20 else (f" ({desc})" if desc else "")
-            response += f"\n- {s['icon']} {s['name']}：{s_score} 分{desc_text}"
+            response += f"\n- {s.icon} {s.name}：{s_score} 分{desc_text}"
         
         response += "\n\n接下來，我們想多了解一下您今天的整體狀況..."
     
@@ -1070,19 +1066,23 @@ def handle_score_selection(score: int, input_method: str = "button", raw_input:
         template_id=template_id
     )
     
-    st.session_state.chat_messages.append({
-        "role": "assistant",
-        "content": response,
-        "source": source.value if source else "ai_generated",
-        "template_id": template_id
-    })
+    add_chat_message(
+        "assistant",
+        response,
+        source=source.value if source else "ai_generated",
+        template_id=template_id
+    )
     
-    st.rerun()
+    if next_idx < N_SYMPTOMS:
+        rerun_chat()
+    else:
+        # 評分完成：整頁重跑，移除片段外的文字輸入框
+        st.rerun()
 
 
 def render_open_ended_questions():
     """渲染開放式問題"""
-    patient_id = st.session_state.patient["id"]
+    patient_id = st.session_state.patient.id
     
     st.markdown("""
     <div class="open-question-card">
@@ -1106,38 +1106,39 @@ def render_open_ended_questions():
             height=80
         )
         
+        # 儲存開放式回應（以題目 ID 為鍵，修改後的回答會覆蓋先前內容）
         if response:
-            # 儲存開放式回應
-            if question['question_id'] not in [r.get('question_id') for r in st.session_state.open_ended_responses]:
-                st.session_state.open_ended_responses.append({
-                    'question_id': question['question_id'],
-                    'question_text': question['question_text'],
-                    'category': question['category'],
-                    'response': response
-                })
+            st.session_state.open_ended_responses[question['question_id']] = {
+                'question_id': question['question_id'],
+                'question_text': question['question_text'],
+                'category': question['category'],
+                'response': response
+            }
+        else:
+            st.session_state.open_ended_responses.pop(question['question_id'], None)
     
     st.markdown("---")
     
     col1, col2 = st.columns(2)
     with col1:
         if st.button("⏭️ 跳過，直接提交", use_container_width=True):
-            st.session_state.current_symptom_index = len(SYMPTOMS) + 1
-            st.rerun()
+            st.session_state.current_symptom_index = N_SYMPTOMS + 1
+            rerun_chat()
     
     with col2:
         if st.button("✅ 完成並提交", type="primary", use_container_width=True):
             # 儲存開放式回應
             save_open_ended_responses()
-            st.session_state.current_symptom_index = len(SYMPTOMS) + 1
-            st.rerun()
+            st.session_state.current_symptom_index = N_SYMPTOMS + 1
+            rerun_chat()
 
 
 def save_open_ended_responses():
     """儲存開放式回應"""
-    patient_id = st.session_state.patient["id"]
+    patient_id = st.session_state.patient.id
     report_id = generate_report_id()
     
-    for response_data in st.session_state.open_ended_responses:
+    for response_data in st.session_state.open_ended_responses.values():
         if response_data.get('response'):
             log_open_ended_response(
                 patient_id=patient_id,
@@ -1152,7 +1153,7 @@ def save_open_ended_responses():
 def submit_report():
     """提交回報（更新版：支援 Google Sheet）"""
     today_str = datetime.now().strftime("%Y-%m-%d")
-    patient_id = st.session_state.patient["id"]
+    patient_id = st.session_state.patient.id
     
     # 儲存開放式回應
     save_open_ended_responses()
@@ -1170,7 +1171,7 @@ def submit_report():
             rm = get_report_manager()
             
             # 收集開放式回答
-            open_ended_list = [r.get('response', '') for r in st.session_state.open_ended_responses]
+            open_ended_list = [r['response'] for r in st.session_state.open_ended_responses.values()]
             
             success, report_id = rm.save_report(
                 patient_id=patient_id,
@@ -1181,58 +1182,52 @@ def submit_report():
             )
             
             if success:
+                clear_patient_cache()
+                
                 # 更新順從度
-                st.session_state.compliance = rm.get_compliance_stats(
+                st.session_state.compliance = load_compliance_stats(
                     patient_id,
-                    st.session_state.patient["surgery_date"]
+                    st.session_state.patient.surgery_date
                 )
+                recompute_derived_state()
                 
-                # 檢查成就
-                am = get_achievement_manager()
-                new_achievements = am.check_and_unlock(patient_id, st.session_state.compliance)
-                
-                if new_achievements:
-                    for ach in new_achievements:
-                        st.toast(f"🎉 獲得新成就：{ach['icon']} {ach['name']}！")
-                    st.balloons()
-                
-                # 更新成就列表
-                st.session_state.achievements = am.get_all_achievements_status(patient_id)
+                # 背景檢查成就（結果於下次重跑時套用）
+                start_achievement_check(patient_id, st.session_state.compliance)
         
         except Exception as e:
             st.warning(f"雲端儲存失敗，資料已暫存本地: {e}")
     
-    # 更新本地狀態
+    # 計算本次積分
+    points = 10 + len(st.session_state.current_descriptions) * 2 + len(st.session_state.open_ended_responses) * 5
+    
+    # 更新本地狀態（分數與描述直接移交給歷史紀錄，不另外複製）
     st.session_state.report_history[today_str] = {
         "completed": True,
         "time": datetime.now().strftime("%H:%M"),
-        "scores": st.session_state.current_scores.copy(),
-        "descriptions": st.session_state.current_descriptions.copy(),
+        "scores": st.session_state.current_scores,
+        "descriptions": st.session_state.current_descriptions,
         "open_ended_count": len(st.session_state.open_ended_responses),
         "method": "ai_chat",
         "session_id": st.session_state.conversation_session_id
     }
+    st.session_state.current_scores = {}
+    st.session_state.current_descriptions = {}
     
     st.session_state.today_reported = True
     
     # Demo 模式下更新順從度
     if st.session_state.use_demo_mode:
-        st.session_state.compliance["current_streak"] += 1
-        st.session_state.compliance["total_completed"] += 1
-        
-        # 計算積分
-        points = 10
-        points += len(st.session_state.current_descriptions) * 2
-        points += len(st.session_state.open_ended_responses) * 5
-        st.session_state.compliance["points"] += points
+        st.session_state.compliance.current_streak += 1
+        st.session_state.compliance.total_completed += 1
+        st.session_state.compliance.points += points
+        recompute_derived_state()
     
     # 顯示完成訊息
-    points = 10 + len(st.session_state.current_descriptions) * 2 + len(st.session_state.open_ended_responses) * 5
     st.success(f"✅ 回報已提交！獲得 {points} 積分")
     
     if st.button("返回首頁"):
         st.session_state.current_page = "home"
-        st.rerun()
+        st.rerun(scope="app")
 
 
 # ============================================
@@ -1244,9 +1239,7 @@ def render_questionnaire():
     st.markdown("透過問卷快速完成今日症狀評估")
     
     # 返回按鈕
-    if st.button("← 返回首頁"):
-        st.session_state.current_page = "home"
-        st.rerun()
+    st.button("← 返回首頁", on_click=go_to_page, args=("home",))
     
     st.markdown("---")
     
@@ -1254,7 +1247,7 @@ def render_questionnaire():
     
     st.markdown(f"""
     <div style="background: #f0f9ff; padding: 1rem; border-radius: 12px; margin-bottom: 1rem;">
-        <strong>👤 {patient['name']}</strong> | 術後第 {patient['post_op_day']} 天
+        <strong>👤 {patient.name}</strong> | 術後第 {patient.post_op_day} 天
     </div>
     """, unsafe_allow_html=True)
     
@@ -1266,22 +1259,20 @@ def render_questionnaire():
     st.markdown("#### 請評估您今天的症狀（0-10分）")
     
     for symptom in SYMPTOMS:
-        st.markdown(f"**{symptom['icon']} {symptom['name']}**")
-        st.markdown(f"<small style='color: #64748b;'>{symptom['question']}</small>", unsafe_allow_html=True)
+        st.markdown(SYMPTOM_HEADER_HTML[symptom.id], unsafe_allow_html=True)
         
         score = st.slider(
-            label=symptom['name'],
+            label=symptom.name,
             min_value=0,
             max_value=10,
-            value=st.session_state.questionnaire_scores.get(symptom['id'], 0),
-            key=f"q_{symptom['id']}",
+            value=st.session_state.questionnaire_scores.get(symptom.id, 0),
+            key=f"q_{symptom.id}",
             label_visibility="collapsed"
         )
-        st.session_state.questionnaire_scores[symptom['id']] = score
+        st.session_state.questionnaire_scores[symptom.id] = score
         
         # 顯示分數說明
-        option = SCORE_OPTIONS[score]
-        st.markdown(f"<span style='color: {option['color']}; font-weight: 500;'>{score} 分 - {option['label']}</span>", unsafe_allow_html=True)
+        st.markdown(SCORE_LABEL_HTML[score], unsafe_allow_html=True)
         st.markdown("")
     
     st.markdown("---")
@@ -1311,29 +1302,24 @@ def render_questionnaire():
                 try:
                     rm = get_report_manager()
                     success, report_id = rm.save_report(
-                        patient_id=patient["id"],
+                        patient_id=patient.id,
                         scores=st.session_state.questionnaire_scores,
                         descriptions={"additional": additional_notes} if additional_notes else {},
                         method="questionnaire"
                     )
                     
                     if success:
+                        clear_patient_cache()
+                        
                         # 更新順從度
-                        st.session_state.compliance = rm.get_compliance_stats(
-                            patient["id"],
-                            patient["surgery_date"]
+                        st.session_state.compliance = load_compliance_stats(
+                            patient.id,
+                            patient.surgery_date
                         )
+                        recompute_derived_state()
                         
-                        # 檢查成就
-                        am = get_achievement_manager()
-                        new_achievements = am.check_and_unlock(patient["id"], st.session_state.compliance)
-                        
-                        if new_achievements:
-                            for ach in new_achievements:
-                                st.toast(f"🎉 獲得新成就：{ach['icon']} {ach['name']}！")
-                            st.balloons()
-                        
-                        st.session_state.achievements = am.get_all_achievements_status(patient["id"])
+                        # 背景檢查成就（結果於下次重跑時套用）
+                        start_achievement_check(patient.id, st.session_state.compliance)
                 
                 except Exception as e:
                     st.warning(f"雲端儲存失敗: {e}")
@@ -1343,7 +1329,7 @@ def render_questionnaire():
             st.session_state.report_history[today_str] = {
                 "completed": True,
                 "time": datetime.now().strftime("%H:%M"),
-                "scores": st.session_state.questionnaire_scores.copy(),
+                "scores": st.session_state.questionnaire_scores,
                 "descriptions": {"additional": additional_notes} if additional_notes else {},
                 "method": "questionnaire"
             }
@@ -1351,9 +1337,10 @@ def render_questionnaire():
             st.session_state.today_reported = True
             
             if st.session_state.use_demo_mode:
-                st.session_state.compliance["current_streak"] += 1
-                st.session_state.compliance["total_completed"] += 1
-                st.session_state.compliance["points"] += 10
+                st.session_state.compliance.current_streak += 1
+                st.session_state.compliance.total_completed += 1
+                st.session_state.compliance.points += 10
+                recompute_derived_state()
             
             st.success("✅ 問卷回報已提交！獲得 10 積分")
             st.balloons()
@@ -1364,15 +1351,35 @@ def render_questionnaire():
 # ============================================
 # 歷史紀錄頁面
 # ============================================
+def report_status(avg_score: float) -> tuple:
+    """依平均分數取得 (顏色, 狀態文字)"""
+    for threshold, color, label in REPORT_STATUS:
+        if avg_score <= threshold:
+            return color, label
+    return REPORT_STATUS[-1][1:]
+
+
+def render_score_grid(scores: dict) -> str:
+    """各症狀分數格（單一 HTML 區塊）"""
+    cells = []
+    for symptom in SYMPTOMS:
+        score = int(scores.get(symptom.id, 0))
+        cells.append(SCORE_CELL_HTML.format(
+            icon=symptom.icon,
+            color=SCORE_OPTIONS[score].color,
+            score=score,
+            name=symptom.name
+        ))
+    return f'<div class="score-grid">{"".join(cells)}</div>'
+
+
 def render_history():
     """渲染歷史紀錄頁面"""
     st.markdown("### 📊 歷史紀錄")
     st.markdown("查看您過去的症狀回報記錄")
     
     # 返回按鈕
-    if st.button("← 返回首頁"):
-        st.session_state.current_page = "home"
-        st.rerun()
+    st.button("← 返回首頁", on_click=go_to_page, args=("home",))
     
     st.markdown("---")
     
@@ -1381,7 +1388,7 @@ def render_history():
     if not st.session_state.use_demo_mode and GOOGLE_SHEET_ENABLED:
         try:
             rm = get_report_manager()
-            reports = rm.get_patient_reports(st.session_state.patient["id"], days=30)
+            reports = rm.get_patient_reports(st.session_state.patient.id, days=30)
         except:
             pass
     
@@ -1396,22 +1403,14 @@ def render_history():
     
     # 顯示雲端記錄
     if reports:
+        # 雲端記錄的日期可能被手動編輯成未補零格式，交給 parse_sheet_date 處理
+        parse_sheet_date = _google_sheet_db().parse_sheet_date
         for record in reports:
-            record_date = datetime.strptime(record["date"], "%Y-%m-%d")
-            weekday = ["一", "二", "三", "四", "五", "六", "日"][record_date.weekday()]
+            record_date = parse_sheet_date(record["date"])
+            weekday = WEEKDAY_NAMES[record_date.weekday()]
             
             scores = record.get('scores', {})
-            avg_score = record.get('avg_score', 0)
-            
-            if avg_score <= 3:
-                status_color = "#10b981"
-                status_text = "良好"
-            elif avg_score <= 6:
-                status_color = "#f59e0b"
-                status_text = "普通"
-            else:
-                status_color = "#ef4444"
-                status_text = "需關注"
+            _, status_text = report_status(record.get('avg_score', 0))
             
             with st.expander(f"📅 {record['date']} (週{weekday}) - {record.get('time', '')} | 狀態：{status_text}"):
                 method = record.get('method', 'unknown')
@@ -1419,18 +1418,7 @@ def render_history():
                 st.markdown(f"**回報方式：** {method_label}")
                 
                 st.markdown("**各症狀評分：**")
-                cols = st.columns(len(SYMPTOMS))
-                for i, symptom in enumerate(SYMPTOMS):
-                    with cols[i]:
-                        score = scores.get(symptom['id'], 0)
-                        color = SCORE_OPTIONS[int(score)]['color']
-                        st.markdown(f"""
-                        <div style="text-align: center; padding: 0.5rem; background: #f8fafc; border-radius: 8px;">
-                            <div style="font-size: 1.5rem;">{symptom['icon']}</div>
-                            <div style="color: {color}; font-weight: bold; font-size: 1.25rem;">{int(score)}</div>
-                            <div style="font-size: 0.7rem; color: #64748b;">{symptom['name']}</div>
-                        </div>
-                        """, unsafe_allow_html=True)
+                st.markdown(render_score_grid(scores), unsafe_allow_html=True)
     
     # 統計摘要
     st.markdown("---")
@@ -1440,12 +1428,11 @@ def render_history():
     
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("總回報次數", f"{compliance['total_completed']} 次")
+        st.metric("總回報次數", f"{compliance.total_completed} 次")
     with col2:
-        rate = (compliance['total_completed'] / compliance['total_days'] * 100) if compliance['total_days'] > 0 else 0
-        st.metric("完成率", f"{rate:.0f}%")
+        st.metric("完成率", f"{st.session_state.completion_rate:.0f}%")
     with col3:
-        st.metric("連續天數", f"{compliance['current_streak']} 天")
+        st.metric("連續天數", f"{compliance.current_streak} 天")
 
 
 # ============================================
@@ -1457,9 +1444,7 @@ def render_achievements():
     st.markdown("查看您獲得的成就和進度")
     
     # 返回按鈕
-    if st.button("← 返回首頁"):
-        st.session_state.current_page = "home"
-        st.rerun()
+    st.button("← 返回首頁", on_click=go_to_page, args=("home",))
     
     st.markdown("---")
     
@@ -1471,11 +1456,11 @@ def render_achievements():
         <div style="display: flex; justify-content: space-between; align-items: center;">
             <div>
                 <div style="font-size: 0.9rem; opacity: 0.9;">目前等級</div>
-                <div style="font-size: 2rem; font-weight: 700;">Lv.{compliance['level']}</div>
+                <div style="font-size: 2rem; font-weight: 700;">Lv.{compliance.level}</div>
             </div>
             <div style="text-align: right;">
                 <div style="font-size: 0.9rem; opacity: 0.9;">累積積分</div>
-                <div style="font-size: 2rem; font-weight: 700;">⭐ {compliance['points']}</div>
+                <div style="font-size: 2rem; font-weight: 700;">⭐ {compliance.points}</div>
             </div>
         </div>
     </div>
@@ -1483,8 +1468,8 @@ def render_achievements():
     
     # 等級進度條
     level_thresholds = [0, 50, 150, 300, 500, 800, 1200]
-    current_level = compliance['level']
-    current_points = compliance['points']
+    current_level = compliance.level
+    current_points = compliance.points
     
     if current_level < len(level_thresholds):
         prev_threshold = level_thresholds[current_level - 1] if current_level > 0 else 0
@@ -1503,37 +1488,28 @@ def render_achievements():
     achievements = st.session_state.achievements
     
     # 已解鎖的成就
-    unlocked = [a for a in achievements if a.get("unlocked")]
+    unlocked = st.session_state.unlocked_achievements
     locked = [a for a in achievements if not a.get("unlocked")]
     
     if unlocked:
         st.markdown("**✨ 已獲得**")
-        cols = st.columns(3)
-        for i, achievement in enumerate(unlocked):
-            with cols[i % 3]:
-                st.markdown(f"""
-                <div style="background: linear-gradient(135deg, #fef3c7 0%, #fde68a 100%); 
-                            padding: 1rem; border-radius: 12px; text-align: center; margin-bottom: 1rem;
-                            border: 2px solid #f59e0b;">
-                    <div style="font-size: 2.5rem; margin-bottom: 0.5rem;">{achievement['icon']}</div>
-                    <div style="font-weight: 600; color: #92400e;">{achievement['name']}</div>
-                    <div style="font-size: 0.75rem; color: #b45309;">獲得於 {achievement.get('date', '-')}</div>
-                </div>
-                """, unsafe_allow_html=True)
+        cards = "".join(
+            ACHIEVEMENT_CARD_HTML.format(
+                icon=achievement["icon"],
+                name=achievement["name"],
+                date=achievement.get("date") or "-"
+            )
+            for achievement in unlocked
+        )
+        st.markdown(f'<div class="achievement-grid">{cards}</div>', unsafe_allow_html=True)
     
     if locked:
         st.markdown("**🔒 未解鎖**")
-        cols = st.columns(3)
-        for i, achievement in enumerate(locked):
-            with cols[i % 3]:
-                st.markdown(f"""
-                <div style="background: #f1f5f9; padding: 1rem; border-radius: 12px; 
-                            text-align: center; margin-bottom: 1rem; opacity: 0.7;">
-                    <div style="font-size: 2.5rem; margin-bottom: 0.5rem; filter: grayscale(100%);">{achievement['icon']}</div>
-                    <div style="font-weight: 600; color: #64748b;">{achievement['name']}</div>
-                    <div style="font-size: 0.75rem; color: #94a3b8;">繼續努力！</div>
-                </div>
-                """, unsafe_allow_html=True)
+        cards = "".join(
+            LOCKED_ACHIEVEMENT_CARD_HTML.format(icon=achievement["icon"], name=achievement["name"])
+            for achievement in locked
+        )
+        st.markdown(f'<div class="achievement-grid">{cards}</div>', unsafe_allow_html=True)
     
     # 積分說明
     st.markdown("---")
@@ -1556,136 +1532,34 @@ def render_achievements():
 def render_education():
     """渲染衛教資訊頁面"""
     st.markdown("### 📚 衛教資訊")
-    st.markdown("肺癌術後照護相關知識")
+    st.text("肺癌術後照護相關知識")
     
     # 返回按鈕
-    if st.button("← 返回首頁"):
-        st.session_state.current_page = "home"
-        st.rerun()
-    
-    st.markdown("---")
+    st.button("← 返回首頁", on_click=go_to_page, args=("home",))
     
-    # 衛教文章分類
-    categories = [
-        {
-            "id": "recovery",
-            "name": "🏥 術後恢復",
-            "articles": [
-                {
-                    "title": "肺葉切除術後注意事項",
-                    "summary": "了解術後傷口護理、活動限制和復原時程",
-                    "content": """
-### 肺葉切除術後注意事項
-
-#### 傷口照護
-- 保持傷口乾燥清潔
-- 手術後約7-10天可拆線
-- 若傷口有紅腫、滲液或發燒，請立即就醫
-
-#### 活動建議
-- 術後第一週：輕度活動，避免提重物
-- 術後第二週：可逐漸增加活動量
-- 術後一個月：可恢復大部分日常活動
-- 完全恢復：約需2-3個月
-"""
-                },
-                {
-                    "title": "呼吸復健運動",
-                    "summary": "簡單有效的呼吸訓練方法",
-                    "content": """
-### 呼吸復健運動
-
-#### 腹式呼吸
-1. 平躺或坐著，放鬆肩膀
-2. 一手放在胸部，一手放在腹部
-3. 用鼻子緩慢吸氣，讓腹部隆起
-4. 用嘴巴緩慢吐氣，腹部自然下降
-5. 每次練習10-15次，每天3-4次
-"""
-                }
-            ]
-        },
-        {
-            "id": "symptoms",
-            "name": "🩺 症狀管理",
-            "articles": [
-                {
-                    "title": "術後疼痛管理",
-                    "summary": "如何有效控制術後疼痛",
-                    "content": """
-### 術後疼痛管理
-
-#### 常見疼痛類型
-- **傷口痛**：手術切口處的疼痛，通常2-3週會明顯改善
-- **胸壁痛**：肋間神經受影響，可能持續較長時間
-
-#### 止痛方法
-1. 按時服用止痛藥
-2. 冰敷/熱敷
-3. 放鬆技巧
-"""
-                }
-            ]
-        },
-        {
-            "id": "lifestyle",
-            "name": "🌿 生活調適",
-            "articles": [
-                {
-                    "title": "營養與飲食建議",
-                    "summary": "促進術後恢復的飲食原則",
-                    "content": """
-### 營養與飲食建議
-
-#### 高蛋白飲食
-- 每公斤體重 1.2-1.5 克蛋白質
-- 來源：魚、雞肉、蛋、豆腐、牛奶
-
-#### 飲食注意
-- 少量多餐，避免過飽影響呼吸
-- 多喝水，幫助痰液稀釋
-"""
-                }
-            ]
-        }
-    ]
+    st.divider()
     
     # 選擇分類
     selected_category = st.selectbox(
         "選擇分類",
-        options=[c["id"] for c in categories],
-        format_func=lambda x: next(c["name"] for c in categories if c["id"] == x),
+        options=tuple(EDUCATION_CATEGORY_NAMES),
+        format_func=EDUCATION_CATEGORY_NAMES.__getitem__,
         label_visibility="collapsed"
     )
     
     # 顯示該分類的文章
-    category = next(c for c in categories if c["id"] == selected_category)
+    category = EDUCATION_CATEGORY_BY_ID[selected_category]
     
     st.markdown(f"#### {category['name']}")
     
     for article in category["articles"]:
         with st.expander(f"📄 {article['title']}"):
-            st.markdown(f"*{article['summary']}*")
-            st.markdown("---")
-            st.markdown(article["content"])
+            st.markdown(article["body"])
     
     # 緊急聯絡資訊
-    st.markdown("---")
+    st.divider()
     st.markdown("#### 🆘 緊急聯絡")
-    st.markdown("""
-    <div style="background: #fef2f2; border: 1px solid #fecaca; padding: 1rem; border-radius: 12px;">
-        <strong style="color: #dc2626;">如有以下情況，請立即就醫：</strong>
-        <ul style="margin: 0.5rem 0; color: #991b1b;">
-            <li>呼吸困難加劇</li>
-            <li>發燒超過38.5°C</li>
-            <li>咳血或痰中帶血</li>
-            <li>傷口紅腫流膿</li>
-        </ul>
-        <div style="margin-top: 0.5rem;">
-            <strong>三軍總醫院急診：</strong> 02-8792-3311
-        </div>
-    </div>
-    """, unsafe_allow_html=True)
+    st.html(EMERGENCY_CONTACT_HTML)
 
 
 # ============================================
@@ -1702,149 +1576,143 @@ def render_data_export():
     with col1:
         st.markdown("#### 對話資料")
         if st.button("匯出標註資料", use_container_width=True):
-            data = conversation_store.export_for_annotation()
-            st.json(data[:5])  # 只顯示前5筆
+            preview, payload = load_annotation_export(conversation_store.version)
+            st.json(preview)  # 只顯示前5筆
             st.download_button(
                 "下載完整資料",
-                data=json.dumps(data, ensure_ascii=False, indent=2),
-                file_name=f"annotation_data_{datetime.now().strftime('%Y%m%d')}.json",
-                mime="application/json"
+                data=payload,
+                file_name=f"annotation_data_{datetime.now().strftime('%Y%m%d')}.ndjson",
+                mime="application/x-ndjson"
             )
     
     with col2:
         st.markdown("#### 開放式回應")
         if st.button("匯出開放式回應", use_container_width=True):
-            data = conversation_store.export_open_ended_for_annotation()
-            st.json(data[:5])
+            preview, payload = load_open_ended_export(conversation_store.version)
+            st.json(preview)
             st.download_button(
                 "下載完整資料",
-                data=json.dumps(data, ensure_ascii=False, indent=2),
-                file_name=f"open_ended_{datetime.now().strftime('%Y%m%d')}.json",
-                mime="application/json"
+                data=payload,
+                file_name=f"open_ended_{datetime.now().strftime('%Y%m%d')}.ndjson",
+                mime="application/x-ndjson"
             )
 
 
 # ============================================
 # 側邊欄
 # ============================================
+SIDEBAR_PAGES = (
+    ("home", "🏠 首頁"),
+    ("history", "📊 歷史紀錄"),
+    ("achievements", "🎖️ 成就中心"),
+    ("education", "📚 衛教資訊"),
+)
+
+
+# 側邊欄按鈕使用 on_click 回呼（見 go_to_page）
+def reset_today_report():
+    """重置今日回報（開發用）"""
+    st.session_state.today_reported = False
+
+
+def logout():
+    """登出並重置所有狀態"""
+    st.session_state.logged_in = False
+    st.session_state.patient = None
+    st.session_state.compliance = None
+    st.session_state.current_page = "login"
+    st.session_state.today_reported = False
+    st.session_state.pending_achievements = None
+    st.session_state.use_demo_mode = False
+
+
 def render_sidebar():
     """渲染側邊欄"""
     with st.sidebar:
-        st.markdown("## 🫁 AI-CARE Lung")
-        st.markdown("肺癌術後智慧照護系統")
+        st.header("🫁 AI-CARE Lung", anchor=False)
+        st.text("肺癌術後智慧照護系統")
         
         # 如果已登入，顯示用戶資訊
         if st.session_state.logged_in and st.session_state.patient:
             patient = st.session_state.patient
-            st.markdown(f"""
+            st.html(f"""
             <div style="background: #f0f9ff; padding: 0.75rem; border-radius: 8px; margin: 0.5rem 0;">
-                <div style="font-weight: 600;">👤 {patient['name']}</div>
-                <div style="font-size: 0.8rem; color: #64748b;">術後第 {patient['post_op_day']} 天</div>
+                <div style="font-weight: 600;">👤 {patient.name}</div>
+                <div style="font-size: 0.8rem; color: #64748b;">術後第 {patient.post_op_day} 天</div>
             </div>
-            """, unsafe_allow_html=True)
+            """)
             
             if st.session_state.use_demo_mode:
-                st.markdown("<small>🎮 Demo 模式</small>", unsafe_allow_html=True)
+                st.caption("🎮 Demo 模式")
         
-        st.markdown("---")
+        st.divider()
         
         # 導航（只有登入後才顯示）
         if st.session_state.logged_in:
             st.markdown("### 📱 功能選單")
             
-            if st.button("🏠 首頁", use_container_width=True):
-                st.session_state.current_page = "home"
-                st.rerun()
+            for page, label in SIDEBAR_PAGES:
+                st.button(label, use_container_width=True, on_click=go_to_page, args=(page,))
             
-            if st.button("📊 歷史紀錄", use_container_width=True):
-                st.session_state.current_page = "history"
-                st.rerun()
-            
-            if st.button("🎖️ 成就中心", use_container_width=True):
-                st.session_state.current_page = "achievements"
-                st.rerun()
-            
-            if st.button("📚 衛教資訊", use_container_width=True):
-                st.session_state.current_page = "education"
-                st.rerun()
-            
-            st.markdown("---")
+            st.divider()
             
             # 開發選項
             with st.expander("🔧 開發選項"):
-                if st.button("📤 資料匯出", use_container_width=True):
-                    st.session_state.current_page = "data_export"
-                    st.rerun()
-                
-                if st.button("🔄 重置今日回報", use_container_width=True):
-                    st.session_state.today_reported = False
-                    st.rerun()
+                st.button("📤 資料匯出", use_container_width=True,
+                          on_click=go_to_page, args=("data_export",))
+                st.button("🔄 重置今日回報", use_container_width=True, on_click=reset_today_report)
             
-            st.markdown("---")
+            st.divider()
             
             # 登出按鈕
-            if st.button("🚪 登出", use_container_width=True):
-                # 重置所有狀態
-                st.session_state.logged_in = False
-                st.session_state.patient = None
-                st.session_state.compliance = None
-                st.session_state.current_page = "login"
-                st.session_state.today_reported = False
-                st.session_state.use_demo_mode = False
-                st.rerun()
+            st.button("🚪 登出", use_container_width=True, on_click=logout)
         
-        st.markdown("---")
-        st.markdown("""
+        st.divider()
+        st.html("""
         <div style="font-size: 0.8rem; color: #64748b; text-align: center;">
             三軍總醫院<br>
             數位醫療中心<br>
             v2.2
         </div>
-        """, unsafe_allow_html=True)
+        """)
 
 
 # ============================================
 # 主程式
 # ============================================
+def render_voice_call():
+    """渲染 AI 語音電話頁面"""
+    render_voice_call_demo = get_voice_call_renderer()
+    if render_voice_call_demo:
+        render_voice_call_demo()
+    else:
+        st.error("AI 語音電話模組未載入")
+        st.button("返回首頁", on_click=go_to_page, args=("home",))
+
+
+# 已登入後的頁面路由
+PAGES = {
+    "home": render_home,
+    "ai_chat": render_ai_chat,
+    "questionnaire": render_questionnaire,
+    "voice_call": render_voice_call,
+    "history": render_history,
+    "achievements": render_achievements,
+    "education": render_education,
+    "data_export": render_data_export,
+}
+
+
 def main():
     """主程式"""
-    # 未登入時不顯示側邊欄導航
-    if st.session_state.logged_in:
-        render_sidebar()
-    
-    page = st.session_state.current_page
-    
-    # 未登入時只能看登入頁
+    # 未登入時只能看登入頁，不建立側邊欄與其他頁面
     if not st.session_state.logged_in:
         render_login()
         return
     
-    # 已登入後的頁面路由
-    if page == "home":
-        render_home()
-    elif page == "ai_chat":
-        render_ai_chat()
-    elif page == "questionnaire":
-        render_questionnaire()
-    elif page == "voice_call":
-        # AI 語音電話 Demo
-        if VOICE_CALL_ENABLED:
-            render_voice_call_demo()
-        else:
-            st.error("AI 語音電話模組未載入")
-            if st.button("返回首頁"):
-                st.session_state.current_page = "home"
-                st.rerun()
-    elif page == "history":
-        render_history()
-    elif page == "achievements":
-        render_achievements()
-    elif page == "education":
-        render_education()
-    elif page == "data_export":
-        render_data_export()
-    else:
-        render_home()
+    apply_achievement_check()
+    render_sidebar()
+    PAGES.get(st.session_state.current_page, render_home)()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,293 @@
+"""
+AI-CARE Lung 病人端 - 靜態介面內容
+==================================
+症狀題目、分數說明、頁面 HTML 範本、對話固定文字與衛教文章
+
+Streamlit 每次重跑都會重新執行 app.py，
+放在獨立模組的內容只會在程序第一次匯入時建立一次
+
+三軍總醫院 數位醫療中心
+"""
+
+from typing import NamedTuple
+
+
+# ============================================
+# 症狀定義
+# ============================================
+
+class Symptom(NamedTuple):
+    """症狀題目"""
+    id: str
+    name: str
+    icon: str
+    question: str
+
+
+class ScoreOption(NamedTuple):
+    """分數說明"""
+    label: str
+    color: str
+
+
+SYMPTOMS = (
+    Symptom("pain", "疼痛", "🩹", "今天傷口或胸部的疼痛程度如何？"),
+    Symptom("fatigue", "疲勞", "😮‍💨", "今天感覺疲勞或虛弱嗎？"),
+    Symptom("dyspnea", "呼吸困難", "💨", "今天呼吸順暢嗎？有沒有喘或胸悶？"),
+    Symptom("cough", "咳嗽", "🤧", "今天咳嗽的情況如何？"),
+    Symptom("sleep", "睡眠", "😴", "昨晚睡得好嗎？"),
+    Symptom("appetite", "食慾", "🍽️", "今天胃口怎麼樣？"),
+    Symptom("mood", "心情", "💭", "今天心情如何？有沒有焦慮或擔心？"),
+)
+
+N_SYMPTOMS = len(SYMPTOMS)
+
+# 以分數（0-10）為索引
+SCORE_OPTIONS = (
+    ScoreOption("完全沒有", "#10b981"),
+    ScoreOption("非常輕微", "#22c55e"),
+    ScoreOption("輕微", "#84cc16"),
+    ScoreOption("輕度", "#a3e635"),
+    ScoreOption("中等偏輕", "#facc15"),
+    ScoreOption("中等", "#fbbf24"),
+    ScoreOption("中等偏重", "#f59e0b"),
+    ScoreOption("明顯", "#fb923c"),
+    ScoreOption("嚴重", "#f97316"),
+    ScoreOption("非常嚴重", "#ef4444"),
+    ScoreOption("極度嚴重", "#dc2626"),
+)
+
+SCORE_CHOICES = tuple(range(len(SCORE_OPTIONS)))
+
+# 歷史紀錄：平均分數上限 → (顏色, 狀態)
+REPORT_STATUS = (
+    (3, "#10b981", "良好"),
+    (6, "#f59e0b", "普通"),
+    (10, "#ef4444", "需關注"),
+)
+
+WEEKDAY_NAMES = ("一", "二", "三", "四", "五", "六", "日")
+
+
+# ============================================
+# 頁面 HTML 範本
+# ============================================
+
+# 問卷靜態 HTML
+SYMPTOM_HEADER_HTML = {
+    s.id: f"**{s.icon} {s.name}**<br><small style='color: #64748b;'>{s.question}</small>"
+    for s in SYMPTOMS
+}
+
+SCORE_LABEL_HTML = tuple(
+    f"<span style='color: {option.color}; font-weight: 500;'>{score} 分 - {option.label}</span>"
+    for score, option in enumerate(SCORE_OPTIONS)
+)
+
+# 首頁卡片 HTML 範本
+DEMO_BANNER_HTML = """<div class="demo-banner">
+    🎮 <strong>Demo 模式</strong> - 資料不會儲存，僅供體驗
+</div>"""
+
+WELCOME_CARD_HTML = """
+<div class="welcome-card">
+    <h2>👋 {name}，您好！</h2>
+    <p>今天是術後第 {post_op_day} 天 | {surgery_type}</p>
+</div>
+"""
+
+SCORE_CELL_HTML = """<div class="score-cell">
+    <div style="font-size: 1.5rem;">{icon}</div>
+    <div style="color: {color}; font-weight: bold; font-size: 1.25rem;">{score}</div>
+    <div style="font-size: 0.7rem; color: #64748b;">{name}</div>
+</div>"""
+
+STATUS_CARD_HTML = """<div class="status-card">
+    <div class="status-icon">{icon}</div>
+    <div class="status-value">{value}</div>
+    <div class="status-label">{label}</div>
+</div>"""
+
+ACHIEVEMENT_BADGE_HTML = """<div class="achievement-badge">
+    <div style="font-size: 2rem;">{icon}</div>
+    <div style="font-size: 0.8rem; color: #64748b;">{name}</div>
+</div>"""
+
+ACHIEVEMENT_CARD_HTML = """<div class="achievement-card">
+    <div style="font-size: 2.5rem; margin-bottom: 0.5rem;">{icon}</div>
+    <div style="font-weight: 600; color: #92400e;">{name}</div>
+    <div style="font-size: 0.75rem; color: #b45309;">獲得於 {date}</div>
+</div>"""
+
+LOCKED_ACHIEVEMENT_CARD_HTML = """<div class="achievement-card locked">
+    <div style="font-size: 2.5rem; margin-bottom: 0.5rem; filter: grayscale(100%);">{icon}</div>
+    <div style="font-weight: 600; color: #64748b;">{name}</div>
+    <div style="font-size: 0.75rem; color: #94a3b8;">繼續努力！</div>
+</div>"""
+
+
+# ============================================
+# AI 對話固定文字
+# ============================================
+
+CHAT_AVATARS = {"assistant": "🤖", "user": "🙂"}
+CHAT_TAIL = 20  # 對話頁預設顯示的最近訊息數
+
+# 對話固定文字
+FIRST_QUESTION_MD = """
+**{icon} {name}評估**
+
+{question}
+
+請選擇 0-10 分：
+- 0 分：完全沒有
+- 1-3 分：輕微
+- 4-6 分：中等
+- 7-10 分：嚴重
+
+💡 您也可以用文字描述症狀的感覺！
+""".format(**SYMPTOMS[0]._asdict())
+
+NEXT_QUESTION_TEMPLATE = """
+
+---
+
+**{icon} {name}評估**
+
+{question}
+
+💡 您也可以用文字描述症狀的感覺！
+"""
+
+NEXT_QUESTION_MD = {
+    symptom.id: NEXT_QUESTION_TEMPLATE.format(**symptom._asdict())
+    for symptom in SYMPTOMS
+}
+
+ASK_SCORE_MD = """
+謝謝您的描述！這對我們了解您的狀況很有幫助。
+
+請問以 0-10 分來說，您今天的{name}大約是幾分呢？
+"""
+
+SUMMARY_HEADER_MD = """
+
+---
+
+🎉 **太棒了！您已完成所有症狀評分！**
+
+以下是今日的回報摘要：
+"""
+
+
+# ============================================
+# 衛教資訊
+# ============================================
+
+# 衛教文章分類
+EDUCATION_CATEGORIES = [
+    {
+        "id": "recovery",
+        "name": "🏥 術後恢復",
+        "articles": [
+            {
+                "title": "肺葉切除術後注意事項",
+                "summary": "了解術後傷口護理、活動限制和復原時程",
+                "content": """
+### 肺葉切除術後注意事項
+
+#### 傷口照護
+- 保持傷口乾燥清潔
+- 手術後約7-10天可拆線
+- 若傷口有紅腫、滲液或發燒，請立即就醫
+
+#### 活動建議
+- 術後第一週：輕度活動，避免提重物
+- 術後第二週：可逐漸增加活動量
+- 術後一個月：可恢復大部分日常活動
+- 完全恢復：約需2-3個月
+"""
+            },
+            {
+                "title": "呼吸復健運動",
+                "summary": "簡單有效的呼吸訓練方法",
+                "content": """
+### 呼吸復健運動
+
+#### 腹式呼吸
+1. 平躺或坐著，放鬆肩膀
+2. 一手放在胸部，一手放在腹部
+3. 用鼻子緩慢吸氣，讓腹部隆起
+4. 用嘴巴緩慢吐氣，腹部自然下降
+5. 每次練習10-15次，每天3-4次
+"""
+            }
+        ]
+    },
+    {
+        "id": "symptoms",
+        "name": "🩺 症狀管理",
+        "articles": [
+            {
+                "title": "術後疼痛管理",
+                "summary": "如何有效控制術後疼痛",
+                "content": """
+### 術後疼痛管理
+
+#### 常見疼痛類型
+- **傷口痛**：手術切口處的疼痛，通常2-3週會明顯改善
+- **胸壁痛**：肋間神經受影響，可能持續較長時間
+
+#### 止痛方法
+1. 按時服用止痛藥
+2. 冰敷/熱敷
+3. 放鬆技巧
+"""
+            }
+        ]
+    },
+    {
+        "id": "lifestyle",
+        "name": "🌿 生活調適",
+        "articles": [
+            {
+                "title": "營養與飲食建議",
+                "summary": "促進術後恢復的飲食原則",
+                "content": """
+### 營養與飲食建議
+
+#### 高蛋白飲食
+- 每公斤體重 1.2-1.5 克蛋白質
+- 來源：魚、雞肉、蛋、豆腐、牛奶
+
+#### 飲食注意
+- 少量多餐，避免過飽影響呼吸
+- 多喝水，幫助痰液稀釋
+"""
+            }
+        ]
+    }
+]
+
+# 預先組好每篇文章的摘要＋內文，渲染時只需一次 st.markdown
+for _category in EDUCATION_CATEGORIES:
+    for _article in _category["articles"]:
+        _article["body"] = f"*{_article['summary']}*\n\n---\n\n{_article['content']}"
+
+EDUCATION_CATEGORY_BY_ID = {c["id"]: c for c in EDUCATION_CATEGORIES}
+EDUCATION_CATEGORY_NAMES = {c["id"]: c["name"] for c in EDUCATION_CATEGORIES}
+
+EMERGENCY_CONTACT_HTML = """
+<div style="background: #fef2f2; border: 1px solid #fecaca; padding: 1rem; border-radius: 12px;">
+    <strong style="color: #dc2626;">如有以下情況，請立即就醫：</strong>
+    <ul style="margin: 0.5rem 0; color: #991b1b;">
+        <li>呼吸困難加劇</li>
+        <li>發燒超過38.5°C</li>
+        <li>咳血或痰中帶血</li>
+        <li>傷口紅腫流膿</li>
+    </ul>
+    <div style="margin-top: 0.5rem;">
+        <strong>三軍總醫院急診：</strong> 02-8792-3311
+    </div>
+</div>
+"""
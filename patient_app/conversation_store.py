@@ -10,10 +10,15 @@ AI-CARE Lung 病人端 - 對話儲存與分析模組
 三軍總醫院 數位醫療中心
 """
 
+from collections import Counter, defaultdict
+import functools
 import json
+import os
 import re
+import sqlite3
+import threading
 from datetime import datetime, date
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, FrozenSet, Iterator, List, Optional, Any, Tuple
 from dataclasses import dataclass, asdict
 import uuid
 
@@ -25,6 +30,185 @@ from models import (
 )
 
 
+# ============================================
+# 簡易 NLP 關鍵字表（依優先順序排列，第一個命中的類別即為結果）
+# 各類別關鍵字為 frozenset，與掃描結果比對時只需雜湊查詢
+# ============================================
+INTENT_KEYWORDS = (
+    # 緊急關鍵字
+    (IntentCategory.EMERGENCY, frozenset({"很痛", "非常痛", "受不了", "喘不過氣", "發燒", "出血", "緊急", "救命"})),
+    # 症狀回報
+    (IntentCategory.SYMPTOM_REPORT, frozenset({"分", "今天", "昨天", "這幾天"})),
+    # 症狀諮詢
+    (IntentCategory.SYMPTOM_INQUIRY, frozenset({"正常嗎", "會不會", "是不是", "怎麼辦", "該怎麼"})),
+    # 藥物問題
+    (IntentCategory.MEDICATION_QUESTION, frozenset({"藥", "吃藥", "止痛", "副作用"})),
+    # 生活建議
+    (IntentCategory.LIFESTYLE_ADVICE, frozenset({"可以", "能不能", "運動", "洗澡", "工作", "開車"})),
+    # 情緒表達
+    (IntentCategory.EMOTIONAL_EXPRESSION, frozenset({"擔心", "害怕", "焦慮", "難過", "開心", "謝謝"})),
+    # 感謝
+    (IntentCategory.GRATITUDE, frozenset({"謝", "感謝"})),
+    # 打招呼
+    (IntentCategory.GREETING, frozenset({"你好", "早安", "午安", "晚安", "嗨"})),
+)
+
+EMOTION_KEYWORDS = (
+    # 焦慮/擔心
+    (EmotionCategory.ANXIOUS, frozenset({"擔心", "害怕", "焦慮", "緊張", "不安", "恐懼"})),
+    # 低落/沮喪
+    (EmotionCategory.DEPRESSED, frozenset({"難過", "沮喪", "低落", "憂鬱", "不想", "沒意思"})),
+    # 正向
+    (EmotionCategory.POSITIVE, frozenset({"謝謝", "感謝", "開心", "高興", "好多了", "進步"})),
+    # 憤怒
+    (EmotionCategory.ANGRY, frozenset({"生氣", "憤怒", "不滿", "抱怨", "受不了"})),
+)
+
+URGENCY_KEYWORDS = (
+    # 緊急
+    (UrgencyLevel.EMERGENCY, frozenset({"非常痛", "劇痛", "喘不過氣", "發高燒", "大量出血", "昏倒", "意識"})),
+    # 重要
+    (UrgencyLevel.IMPORTANT, frozenset({"很痛", "發燒", "出血", "嚴重", "惡化", "加重"})),
+)
+
+SYMPTOM_KEYWORDS = tuple(
+    (symptom_type.value, frozenset(definition.get("keywords", [])))
+    for symptom_type, definition in SYMPTOM_DEFINITIONS.items()
+)
+
+
+def _build_keyword_scanner(tables) -> Tuple["re.Pattern", Dict[str, FrozenSet[str]]]:
+    """
+    將所有關鍵字編譯成單一正規表示式，一次掃描即可找出全部命中的關鍵字
+    
+    以 lookahead 允許重疊比對；同一位置只會回報最長的關鍵字，
+    因此另外記錄每個關鍵字所包含的較短關鍵字一併視為命中
+    """
+    keywords = sorted({kw for table in tables for _, kws in table for kw in kws}, key=len, reverse=True)
+    pattern = re.compile("(?=(" + "|".join(map(re.escape, keywords)) + "))")
+    contained = {kw: frozenset(k for k in keywords if k in kw) for kw in keywords}
+    return pattern, contained
+
+
+_KEYWORD_RE, _CONTAINED_KEYWORDS = _build_keyword_scanner(
+    (INTENT_KEYWORDS, EMOTION_KEYWORDS, URGENCY_KEYWORDS, SYMPTOM_KEYWORDS)
+)
+
+
+# 病人常重複相同的短句與按鈕輸入，偵測結果以原始文字快取
+@functools.lru_cache(maxsize=4096)
+def find_keywords(text: str) -> FrozenSet[str]:
+    """掃描文字一次，回傳出現過的所有關鍵字"""
+    found = set()
+    for match in _KEYWORD_RE.finditer(text):
+        found |= _CONTAINED_KEYWORDS[match.group(1)]
+    return frozenset(found)
+
+
+def _first_match(table, found: FrozenSet[str], default):
+    """依優先順序回傳第一個有關鍵字命中的類別"""
+    for label, keywords in table:
+        if not found.isdisjoint(keywords):
+            return label
+    return default
+
+
+@functools.lru_cache(maxsize=4096)
+def detect_all(text: str) -> Tuple[IntentCategory, EmotionCategory, UrgencyLevel]:
+    """一次取得意圖、情緒與緊急程度（快取）"""
+    found = find_keywords(text)
+    return (
+        _first_match(INTENT_KEYWORDS, found, IntentCategory.OTHER),
+        _first_match(EMOTION_KEYWORDS, found, EmotionCategory.NEUTRAL),
+        _first_match(URGENCY_KEYWORDS, found, UrgencyLevel.NORMAL),
+    )
+
+
+# ============================================
+# SQLite 對話日誌（可選，持久化用）
+# ============================================
+
+JOURNAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    patient_id TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    message_id TEXT PRIMARY KEY,
+    session_id TEXT,
+    patient_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS open_ended_responses (
+    response_id TEXT PRIMARY KEY,
+    patient_id TEXT NOT NULL,
+    response_time TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_patient ON messages (patient_id, role, timestamp);
+CREATE INDEX IF NOT EXISTS idx_messages_time ON messages (timestamp);
+CREATE INDEX IF NOT EXISTS idx_responses_patient ON open_ended_responses (patient_id, response_time);
+"""
+
+
+class ConversationJournal:
+    """
+    對話日誌：將新增的會話/訊息/開放式回應同步寫入 SQLite
+    
+    記憶體中的 ConversationStore 仍是查詢來源；
+    日誌確保程序重啟後資料不遺失，並可直接以 SQL 供研究匯出
+    """
+    
+    __slots__ = ("_lock", "_db")
+    
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(JOURNAL_SCHEMA)
+    
+    def _write(self, sql: str, params: tuple):
+        with self._lock:
+            self._db.execute(sql, params)
+    
+    def save_session(self, session: ConversationSession):
+        """寫入或更新會話（訊息另存於 messages 表）"""
+        data = session.to_dict()
+        del data["messages"]
+        self._write(
+            "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+            (session.session_id, session.patient_id, data["start_time"],
+             json.dumps(data, ensure_ascii=False))
+        )
+    
+    def save_message(self, message: ConversationMessage):
+        """寫入訊息"""
+        data = message.to_dict()
+        self._write(
+            "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?)",
+            (message.message_id, message.session_id, message.patient_id,
+             data["role"], data["timestamp"], json.dumps(data, ensure_ascii=False))
+        )
+    
+    def save_open_ended_response(self, response: OpenEndedResponse):
+        """寫入開放式回應"""
+        data = response.to_dict()
+        self._write(
+            "INSERT OR REPLACE INTO open_ended_responses VALUES (?, ?, ?, ?)",
+            (response.response_id, response.patient_id, data["response_time"],
+             json.dumps(data, ensure_ascii=False))
+        )
+    
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
 class ConversationStore:
     """
     對話儲存管理器
@@ -35,14 +219,46 @@ class ConversationStore:
     - 匯出標註資料
     """
     
-    def __init__(self):
-        # 記憶體儲存（實際部署時改為資料庫）
+    __slots__ = (
+        "journal", "sessions", "messages", "open_ended_responses", "daily_sessions",
+        "messages_by_date", "responses_by_patient",
+        "export_records",
+        "session_counts", "patient_message_counts", "intent_counts", "emotion_counts", "word_totals",
+        "active_session_id", "version",
+    )
+    
+    def __init__(self, db_path: Optional[str] = None):
+        # 記憶體儲存（查詢用）；指定 db_path 時另外同步寫入 SQLite 日誌
+        self.journal: Optional[ConversationJournal] = (
+            ConversationJournal(db_path) if db_path else None
+        )
+        
         self.sessions: Dict[str, ConversationSession] = {}
         self.messages: Dict[str, ConversationMessage] = {}
         self.open_ended_responses: Dict[str, OpenEndedResponse] = {}
         
+        # 每日會話索引：(patient_id, session_type, 日期) → session_id
+        self.daily_sessions: Dict[Tuple[str, str, str], str] = {}
+        
+        # 查詢索引（新增時維護，避免統計/匯出時掃描全部訊息）
+        self.messages_by_date: Dict[date, List[ConversationMessage]] = defaultdict(list)
+        self.responses_by_patient: Dict[str, List[OpenEndedResponse]] = defaultdict(list)
+        
+        # 標註匯出快取：message_id → 匯出資料（訊息存入後不再修改，可直接重用）
+        self.export_records: Dict[str, Dict[str, Any]] = {}
+        
+        # 病人統計（新增時累加，查詢時直接讀取）
+        self.session_counts: Counter = Counter()
+        self.patient_message_counts: Counter = Counter()
+        self.intent_counts: Dict[str, Counter] = defaultdict(Counter)
+        self.emotion_counts: Dict[str, Counter] = defaultdict(Counter)
+        self.word_totals: Counter = Counter()
+        
         # 當前活躍會話
         self.active_session_id: Optional[str] = None
+        
+        # 資料版本號：每次新增/異動都會遞增，供匯出快取判斷是否過期
+        self.version = 0
     
     # ============================================
     # 會話管理
@@ -59,6 +275,27 @@ class ConversationStore:
         
         self.sessions[session.session_id] = session
         self.active_session_id = session.session_id
+        self.session_counts[patient_id] += 1
+        if self.journal:
+            self.journal.save_session(session)
+        self.version += 1
+        
+        return session
+    
+    def get_or_start_session(self, patient_id: str, session_type: str = "daily_report") -> ConversationSession:
+        """
+        取得病人當天尚未結束的會話，沒有才開始新會話
+        
+        重複點擊或來回切換頁面時不會產生重複的會話
+        """
+        key = (patient_id, session_type, date.today().isoformat())
+        session = self.sessions.get(self.daily_sessions.get(key, ""))
+        
+        if session is None or session.is_completed:
+            session = self.start_session(patient_id, session_type)
+            self.daily_sessions[key] = session.session_id
+        else:
+            self.active_session_id = session.session_id
         
         return session
     
@@ -69,6 +306,9 @@ class ConversationStore:
             session.end_time = datetime.now()
             session.is_completed = True
             session.completion_type = completion_type
+            self.version += 1
+            if self.journal:
+                self.journal.save_session(session)
             
             if self.active_session_id == session_id:
                 self.active_session_id = None
@@ -99,10 +339,8 @@ class ConversationStore:
         if session_id is None:
             session_id = self.active_session_id
         
-        # 自動偵測意圖和情緒
-        detected_intent = self._detect_intent(content)
-        detected_emotion = self._detect_emotion(content)
-        detected_urgency = self._detect_urgency(content)
+        # 自動偵測意圖和情緒（相同文字直接取快取結果）
+        detected_intent, detected_emotion, detected_urgency = detect_all(content)
         
         message = ConversationMessage(
             message_id=generate_message_id(),
@@ -120,6 +358,12 @@ class ConversationStore:
         )
         
         self.messages[message.message_id] = message
+        self._index_message(message)
+        self.patient_message_counts[patient_id] += 1
+        self.intent_counts[patient_id][detected_intent.value] += 1
+        self.emotion_counts[patient_id][detected_emotion.value] += 1
+        self.word_totals[patient_id] += len(content.split())
+        self.version += 1
         
         # 加入會話
         if session_id and session_id in self.sessions:
@@ -156,6 +400,8 @@ class ConversationStore:
         )
         
         self.messages[message.message_id] = message
+        self._index_message(message)
+        self.version += 1
         
         # 加入會話
         if session_id and session_id in self.sessions:
@@ -163,6 +409,12 @@ class ConversationStore:
         
         return message
     
+    def _index_message(self, message: ConversationMessage):
+        """將訊息加入日期索引（並寫入日誌）"""
+        self.messages_by_date[message.timestamp.date()].append(message)
+        if self.journal:
+            self.journal.save_message(message)
+    
     # ============================================
     # 開放式問題回應
     # ============================================
@@ -179,9 +431,10 @@ class ConversationStore:
     ) -> OpenEndedResponse:
         """新增開放式問題回應"""
         
-        # 自動偵測症狀關鍵字
+        # 自動偵測症狀關鍵字（與情緒共用同一次掃描）
         detected_symptoms = self._extract_symptoms(response_text)
-        detected_emotion = self._detect_emotion(response_text).value
+        _, emotion, _ = detect_all(response_text)
+        detected_emotion = emotion.value
         
         response = OpenEndedResponse(
             response_id=generate_response_id(),
@@ -197,6 +450,10 @@ class ConversationStore:
         )
         
         self.open_ended_responses[response.response_id] = response
+        self.responses_by_patient[patient_id].append(response)
+        if self.journal:
+            self.journal.save_open_ended_response(response)
+        self.version += 1
         
         return response
     
@@ -204,170 +461,122 @@ class ConversationStore:
     # 簡易 NLP 偵測（為未來標註準備）
     # ============================================
     
-    def _detect_intent(self, text: str) -> IntentCategory:
+    def _detect_intent(self, text: str, found: Optional[FrozenSet[str]] = None) -> IntentCategory:
         """
         簡易意圖偵測
         
         注意：這是規則式偵測，僅作為預設值
         最終需要人工標註確認
         """
-        text_lower = text.lower()
-        
-        # 緊急關鍵字
-        emergency_keywords = ["很痛", "非常痛", "受不了", "喘不過氣", "發燒", "出血", "緊急", "救命"]
-        if any(kw in text for kw in emergency_keywords):
-            return IntentCategory.EMERGENCY
-        
-        # 症狀回報
-        symptom_keywords = ["分", "今天", "昨天", "這幾天"]
-        if any(kw in text for kw in symptom_keywords):
-            return IntentCategory.SYMPTOM_REPORT
-        
-        # 症狀諮詢
-        inquiry_keywords = ["正常嗎", "會不會", "是不是", "怎麼辦", "該怎麼"]
-        if any(kw in text for kw in inquiry_keywords):
-            return IntentCategory.SYMPTOM_INQUIRY
-        
-        # 藥物問題
-        medication_keywords = ["藥", "吃藥", "止痛", "副作用"]
-        if any(kw in text for kw in medication_keywords):
-            return IntentCategory.MEDICATION_QUESTION
-        
-        # 生活建議
-        lifestyle_keywords = ["可以", "能不能", "運動", "洗澡", "工作", "開車"]
-        if any(kw in text for kw in lifestyle_keywords):
-            return IntentCategory.LIFESTYLE_ADVICE
-        
-        # 情緒表達
-        emotion_keywords = ["擔心", "害怕", "焦慮", "難過", "開心", "謝謝"]
-        if any(kw in text for kw in emotion_keywords):
-            return IntentCategory.EMOTIONAL_EXPRESSION
-        
-        # 感謝
-        if "謝" in text or "感謝" in text:
-            return IntentCategory.GRATITUDE
-        
-        # 打招呼
-        greeting_keywords = ["你好", "早安", "午安", "晚安", "嗨"]
-        if any(kw in text for kw in greeting_keywords):
-            return IntentCategory.GREETING
-        
-        return IntentCategory.OTHER
-    
-    def _detect_emotion(self, text: str) -> EmotionCategory:
+        if found is None:
+            found = find_keywords(text)
+        return _first_match(INTENT_KEYWORDS, found, IntentCategory.OTHER)
+    
+    def _detect_emotion(self, text: str, found: Optional[FrozenSet[str]] = None) -> EmotionCategory:
         """
         簡易情緒偵測
         
         注意：這是規則式偵測，僅作為預設值
         """
-        # 焦慮/擔心
-        anxious_keywords = ["擔心", "害怕", "焦慮", "緊張", "不安", "恐懼"]
-        if any(kw in text for kw in anxious_keywords):
-            return EmotionCategory.ANXIOUS
-        
-        # 低落/沮喪
-        depressed_keywords = ["難過", "沮喪", "低落", "憂鬱", "不想", "沒意思"]
-        if any(kw in text for kw in depressed_keywords):
-            return EmotionCategory.DEPRESSED
-        
-        # 正向
-        positive_keywords = ["謝謝", "感謝", "開心", "高興", "好多了", "進步"]
-        if any(kw in text for kw in positive_keywords):
-            return EmotionCategory.POSITIVE
-        
-        # 憤怒
-        angry_keywords = ["生氣", "憤怒", "不滿", "抱怨", "受不了"]
-        if any(kw in text for kw in angry_keywords):
-            return EmotionCategory.ANGRY
-        
-        return EmotionCategory.NEUTRAL
+        if found is None:
+            found = find_keywords(text)
+        return _first_match(EMOTION_KEYWORDS, found, EmotionCategory.NEUTRAL)
     
-    def _detect_urgency(self, text: str) -> UrgencyLevel:
+    def _detect_urgency(self, text: str, found: Optional[FrozenSet[str]] = None) -> UrgencyLevel:
         """簡易緊急程度偵測"""
-        # 緊急
-        emergency_keywords = ["非常痛", "劇痛", "喘不過氣", "發高燒", "大量出血", "昏倒", "意識"]
-        if any(kw in text for kw in emergency_keywords):
-            return UrgencyLevel.EMERGENCY
-        
-        # 重要
-        important_keywords = ["很痛", "發燒", "出血", "嚴重", "惡化", "加重"]
-        if any(kw in text for kw in important_keywords):
-            return UrgencyLevel.IMPORTANT
-        
-        # 一般
-        return UrgencyLevel.NORMAL
+        if found is None:
+            found = find_keywords(text)
+        return _first_match(URGENCY_KEYWORDS, found, UrgencyLevel.NORMAL)
     
-    def _extract_symptoms(self, text: str) -> List[str]:
+    def _extract_symptoms(self, text: str, found: Optional[FrozenSet[str]] = None) -> List[str]:
         """提取症狀關鍵字"""
-        detected = []
-        
-        for symptom_type, definition in SYMPTOM_DEFINITIONS.items():
-            keywords = definition.get("keywords", [])
-            for keyword in keywords:
-                if keyword in text:
-                    detected.append(symptom_type.value)
-                    break
-        
-        return detected
+        if found is None:
+            found = find_keywords(text)
+        return [
+            symptom for symptom, keywords in SYMPTOM_KEYWORDS
+            if not found.isdisjoint(keywords)
+        ]
     
     # ============================================
     # 資料匯出（供標註團隊使用）
     # ============================================
     
-    def export_for_annotation(
+    def iter_annotation_records(
         self,
         start_date: Optional[date] = None,
         end_date: Optional[date] = None,
         include_ai_responses: bool = False
-    ) -> List[Dict[str, Any]]:
+    ) -> Iterator[Dict[str, Any]]:
         """
-        匯出標註資料
+        逐筆產生標註資料
         
-        預設只匯出病人輸入，供標註團隊使用
+        預設只匯出病人輸入，供標註團隊使用；
+        每則訊息的資料會快取重用，請勿修改產生的 dict
         """
-        export_data = []
+        # 日期過濾：只走訪範圍內的日期索引（訊息依時間先後加入）
+        messages = (
+            message
+            for msg_date, day_messages in self.messages_by_date.items()
+            if not (start_date and msg_date < start_date)
+            and not (end_date and msg_date > end_date)
+            for message in day_messages
+        )
         
-        for message in self.messages.values():
+        for message in messages:
             # 只匯出病人訊息
             if not include_ai_responses and message.role != MessageRole.PATIENT:
                 continue
             
-            # 日期過濾
-            msg_date = message.timestamp.date()
-            if start_date and msg_date < start_date:
-                continue
-            if end_date and msg_date > end_date:
-                continue
+            record = self.export_records.get(message.message_id)
+            if record is None:
+                record = self.export_records[message.message_id] = self._annotation_record(message)
+            yield record
+    
+    @staticmethod
+    def _annotation_record(message: ConversationMessage) -> Dict[str, Any]:
+        """建立單筆標註匯出資料"""
+        return {
+            "message_id": message.message_id,
+            "patient_id": message.patient_id,
+            "timestamp": message.timestamp.isoformat(),
+            "content": message.content,
+            "raw_input": message.raw_input,
+            "input_method": message.input_method,
             
-            export_item = {
-                "message_id": message.message_id,
-                "patient_id": message.patient_id,
-                "timestamp": message.timestamp.isoformat(),
-                "content": message.content,
-                "raw_input": message.raw_input,
-                "input_method": message.input_method,
-                
-                # 預設標註（供參考）
-                "auto_detected_intent": message.detected_intent.value,
-                "auto_detected_emotion": message.detected_emotion.value,
-                "auto_detected_urgency": message.detected_urgency.value,
-                
-                # 人工標註欄位（待填寫）
-                "annotated_intent": message.annotated_intent,
-                "annotated_emotion": message.annotated_emotion,
-                "annotated_urgency": message.annotated_urgency,
-                "annotated_entities": message.annotated_entities,
-                "annotator_id": None,
-                "annotation_time": None
-            }
+            # 預設標註（供參考）
+            "auto_detected_intent": message.detected_intent.value,
+            "auto_detected_emotion": message.detected_emotion.value,
+            "auto_detected_urgency": message.detected_urgency.value,
             
-            export_data.append(export_item)
-        
-        return export_data
+            # 人工標註欄位（待填寫）
+            "annotated_intent": message.annotated_intent,
+            "annotated_emotion": message.annotated_emotion,
+            "annotated_urgency": message.annotated_urgency,
+            "annotated_entities": message.annotated_entities,
+            "annotator_id": None,
+            "annotation_time": None
+        }
+    
+    def export_for_annotation(
+        self,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        include_ai_responses: bool = False
+    ) -> List[Dict[str, Any]]:
+        """匯出標註資料（回傳副本，可自由修改）"""
+        return [
+            dict(record)
+            for record in self.iter_annotation_records(start_date, end_date, include_ai_responses)
+        ]
+    
+    def iter_open_ended_records(self) -> Iterator[Dict[str, Any]]:
+        """逐筆產生開放式回應標註資料"""
+        for resp in self.open_ended_responses.values():
+            yield resp.to_dict()
     
     def export_open_ended_for_annotation(self) -> List[Dict[str, Any]]:
         """匯出開放式回應供標註"""
-        return [resp.to_dict() for resp in self.open_ended_responses.values()]
+        return list(self.iter_open_ended_records())
     
     def export_sessions_summary(self) -> List[Dict[str, Any]]:
         """匯出會話摘要"""
@@ -399,44 +608,18 @@ class ConversationStore:
     
     def get_patient_stats(self, patient_id: str) -> Dict[str, Any]:
         """取得病人對話統計"""
-        patient_messages = [
-            m for m in self.messages.values()
-            if m.patient_id == patient_id and m.role == MessageRole.PATIENT
-        ]
-        
-        patient_sessions = [
-            s for s in self.sessions.values()
-            if s.patient_id == patient_id
-        ]
-        
-        # 計算統計
-        total_messages = len(patient_messages)
-        total_words = sum(len(m.content.split()) for m in patient_messages)
-        
-        # 意圖分布
-        intent_distribution = {}
-        for m in patient_messages:
-            intent = m.detected_intent.value
-            intent_distribution[intent] = intent_distribution.get(intent, 0) + 1
-        
-        # 情緒分布
-        emotion_distribution = {}
-        for m in patient_messages:
-            emotion = m.detected_emotion.value
-            emotion_distribution[emotion] = emotion_distribution.get(emotion, 0) + 1
+        total_messages = self.patient_message_counts[patient_id]
+        total_words = self.word_totals[patient_id]
         
         return {
             "patient_id": patient_id,
-            "total_sessions": len(patient_sessions),
+            "total_sessions": self.session_counts[patient_id],
             "total_messages": total_messages,
             "total_words": total_words,
             "avg_words_per_message": total_words / total_messages if total_messages > 0 else 0,
-            "intent_distribution": intent_distribution,
-            "emotion_distribution": emotion_distribution,
-            "open_ended_responses": len([
-                r for r in self.open_ended_responses.values()
-                if r.patient_id == patient_id
-            ])
+            "intent_distribution": dict(self.intent_counts.get(patient_id, {})),
+            "emotion_distribution": dict(self.emotion_counts.get(patient_id, {})),
+            "open_ended_responses": len(self.responses_by_patient.get(patient_id, []))
         }
 
 
@@ -444,8 +627,8 @@ class ConversationStore:
 # 全域實例
 # ============================================
 
-# 建立全域對話儲存器
-conversation_store = ConversationStore()
+# 建立全域對話儲存器（設定 AICARE_CONVERSATION_DB 時同步寫入 SQLite）
+conversation_store = ConversationStore(db_path=os.environ.get("AICARE_CONVERSATION_DB"))
 
 
 # ============================================
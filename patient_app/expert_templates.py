@@ -10,14 +10,24 @@ AI-CARE Lung 病人端 - 專家回應範本管理
 三軍總醫院 數位醫療中心
 """
 
+from collections import Counter
 from datetime import datetime, date
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, FrozenSet, List, Optional, Any, Tuple
 from dataclasses import dataclass, field
+import functools
+import heapq
 import json
+import random
 import re
 
 from models import ExpertResponseTemplate, MessageSource
 
+# 匹配快取上限（超過即整批清除）
+MATCH_CACHE_SIZE = 1024
+
+# 範本變數格式：{variable}
+TEMPLATE_VARIABLE_RE = re.compile(r"\{(\w+)\}")
+
 
 class ExpertTemplateManager:
     """
@@ -31,6 +41,21 @@ class ExpertTemplateManager:
         # 範本儲存
         self.templates: Dict[str, ExpertResponseTemplate] = {}
         
+        # 匹配結果快取：查詢條件 → 範本 ID（範本異動時清除）
+        self._match_cache: Dict[tuple, Optional[str]] = {}
+        
+        # 可用範本分類索引：類別 → 已啟用且已審核的範本（範本異動時重建）
+        self._category_index: Optional[Dict[str, List[ExpertResponseTemplate]]] = None
+        
+        # 觸發關鍵字索引：類別 → (關鍵字正規表示式, 關鍵字 → 命中的範本 ID)（範本異動時清除）
+        self._keyword_indexes: Dict[str, Optional[Tuple["re.Pattern", Dict[str, FrozenSet[str]]]]] = {}
+        
+        # 觸發條件拆解結果：範本 ID → (症狀條件, 分數範圍, 其他上下文條件)
+        self._conditions: Dict[str, tuple] = {}
+        
+        # 使用統計快取（範本異動或使用次數變動時清除）
+        self._stats_cache: Optional[Dict[str, Any]] = None
+        
         # 載入預設範本
         self._load_default_templates()
     
@@ -40,6 +65,89 @@ class ExpertTemplateManager:
         for template in default_templates:
             self.templates[template.template_id] = template
     
+    def _invalidate(self):
+        """範本異動後清除匹配快取與分類索引"""
+        self._match_cache.clear()
+        self._category_index = None
+        self._keyword_indexes.clear()
+        self._conditions.clear()
+        self._stats_cache = None
+    
+    def _template_conditions(self, template: ExpertResponseTemplate) -> tuple:
+        """
+        拆解範本觸發條件（快取）
+        
+        Returns:
+            (是否有症狀條件, 症狀類型, 分數範圍或 None, 其他上下文條件)
+        """
+        parsed = self._conditions.get(template.template_id)
+        if parsed is None:
+            conditions = template.trigger_conditions
+            parsed = (
+                "symptom_type" in conditions,
+                conditions.get("symptom_type"),
+                conditions.get("score_range"),
+                tuple(
+                    (key, value) for key, value in conditions.items()
+                    if key not in ("symptom_type", "score_range")
+                )
+            )
+            self._conditions[template.template_id] = parsed
+        return parsed
+    
+    def _keyword_index(self, category: str) -> Optional[Tuple["re.Pattern", Dict[str, FrozenSet[str]]]]:
+        """
+        將類別內所有範本的觸發關鍵字編譯成單一正規表示式
+        
+        以 lookahead 允許重疊比對；同一位置只會回報最長的關鍵字，
+        因此每個關鍵字對應到所有「觸發關鍵字包含在其中」的範本
+        """
+        if category in self._keyword_indexes:
+            return self._keyword_indexes[category]
+        
+        owners: Dict[str, set] = {}
+        for template in self._active_templates(category):
+            for kw in template.trigger_keywords:
+                owners.setdefault(kw, set()).add(template.template_id)
+        
+        index = None
+        if owners:
+            keywords = sorted(owners, key=len, reverse=True)
+            pattern = re.compile("(?=(" + "|".join(map(re.escape, keywords)) + "))")
+            templates_for = {
+                kw: frozenset(tid for k in keywords if k in kw for tid in owners[k])
+                for kw in keywords
+            }
+            index = (pattern, templates_for)
+        
+        self._keyword_indexes[category] = index
+        return index
+    
+    def _keyword_hits(self, category: str, keywords: Optional[List[str]]) -> Counter:
+        """每個範本被幾個輸入關鍵字命中（每個輸入關鍵字只掃描一次）"""
+        hits = Counter()
+        index = self._keyword_index(category) if keywords else None
+        if index is None:
+            return hits
+        
+        pattern, templates_for = index
+        for kw in keywords:
+            matched = set()
+            for match in pattern.finditer(kw):
+                matched |= templates_for[match.group(1)]
+            hits.update(matched)
+        return hits
+    
+    def _active_templates(self, category: str) -> List[ExpertResponseTemplate]:
+        """取得某類別中已啟用且已審核的範本"""
+        if self._category_index is None:
+            index: Dict[str, List[ExpertResponseTemplate]] = {}
+            for template in self.templates.values():
+                if template.is_active and template.is_approved:
+                    index.setdefault(template.category, []).append(template)
+            self._category_index = index
+        return self._category_index.get(category, [])
+    
     # ============================================
     # 範本查詢
     # ============================================
@@ -60,33 +168,75 @@ class ExpertTemplateManager:
         2. 關鍵字匹配
         3. 類別匹配
         """
-        candidates = []
+        key = self._match_key(category, symptom_type, score, keywords, context)
         
-        for template in self.templates.values():
-            if not template.is_active or not template.is_approved:
-                continue
-            
-            if template.category != category:
-                continue
-            
-            # 檢查觸發條件
-            match_score = self._calculate_match_score(
-                template, symptom_type, score, keywords, context
+        if key is not None and key in self._match_cache:
+            template_id = self._match_cache[key]
+            best_template = self.templates.get(template_id) if template_id else None
+        else:
+            best_template = self._find_best_template(
+                category, symptom_type, score, keywords, context
             )
-            
-            if match_score > 0:
-                candidates.append((template, match_score))
+            if key is not None:
+                if len(self._match_cache) >= MATCH_CACHE_SIZE:
+                    self._match_cache.clear()
+                self._match_cache[key] = best_template.template_id if best_template else None
         
-        if not candidates:
+        if best_template is None:
             return None
         
-        # 返回最佳匹配
-        candidates.sort(key=lambda x: x[1], reverse=True)
-        best_template = candidates[0][0]
-        
         # 更新使用統計
         best_template.use_count += 1
         best_template.last_used = datetime.now()
+        self._stats_cache = None
+        
+        return best_template
+    
+    def _match_key(
+        self,
+        category: str,
+        symptom_type: Optional[str],
+        score: Optional[int],
+        keywords: Optional[List[str]],
+        context: Optional[Dict[str, Any]]
+    ) -> Optional[tuple]:
+        """匹配快取鍵（上下文含不可雜湊的值時回傳 None，不快取）"""
+        key = (
+            category,
+            symptom_type,
+            score,
+            tuple(sorted(keywords)) if keywords else None,  # 關鍵字順序不影響分數
+            frozenset(context.items()) if context else None
+        )
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+    
+    def _find_best_template(
+        self,
+        category: str,
+        symptom_type: Optional[str],
+        score: Optional[int],
+        keywords: Optional[List[str]],
+        context: Optional[Dict[str, Any]]
+    ) -> Optional[ExpertResponseTemplate]:
+        """逐一計算範本匹配分數，回傳最佳範本"""
+        best_template = None
+        best_score = 0.0
+        keyword_hits = self._keyword_hits(category, keywords)
+        
+        for template in self._active_templates(category):
+            # 檢查觸發條件
+            match_score = self._calculate_match_score(
+                template, symptom_type, score, keyword_hits[template.template_id], context
+            )
+            
+            # 同分時保留較早的範本
+            if match_score > best_score:
+                best_template = template
+                best_score = match_score
         
         return best_template
     
@@ -95,41 +245,34 @@ class ExpertTemplateManager:
         template: ExpertResponseTemplate,
         symptom_type: Optional[str],
         score: Optional[int],
-        keywords: Optional[List[str]],
+        keyword_hits: int,
         context: Optional[Dict[str, Any]]
     ) -> float:
-        """計算範本匹配分數"""
+        """計算範本匹配分數（先檢查會直接排除的條件）"""
+        has_symptom, required_symptom, score_range, extra_conditions = (
+            self._template_conditions(template)
+        )
         match_score = 0.0
-        conditions = template.trigger_conditions
         
         # 檢查症狀類型
-        if symptom_type and "symptom_type" in conditions:
-            if conditions["symptom_type"] == symptom_type:
-                match_score += 2.0
-            else:
+        if symptom_type and has_symptom:
+            if required_symptom != symptom_type:
                 return 0.0  # 症狀不匹配，直接排除
+            match_score += 2.0
         
         # 檢查分數範圍
-        if score is not None and "score_range" in conditions:
-            min_score, max_score = conditions["score_range"]
-            if min_score <= score <= max_score:
-                match_score += 1.5
-            else:
+        if score is not None and score_range is not None:
+            min_score, max_score = score_range
+            if not min_score <= score <= max_score:
                 return 0.0  # 分數不在範圍，排除
+            match_score += 1.5
         
-        # 檢查關鍵字
-        if keywords and template.trigger_keywords:
-            keyword_matches = sum(
-                1 for kw in keywords
-                if any(tkw in kw for tkw in template.trigger_keywords)
-            )
-            match_score += keyword_matches * 0.5
+        # 檢查關鍵字（命中數由 _keyword_hits 一次算好）
+        match_score += keyword_hits * 0.5
         
         # 檢查其他上下文條件
-        if context and conditions:
-            for key, value in conditions.items():
-                if key in ["symptom_type", "score_range"]:
-                    continue
+        if context and extra_conditions:
+            for key, value in extra_conditions:
                 if key in context and context[key] == value:
                     match_score += 0.5
         
@@ -156,7 +299,6 @@ class ExpertTemplateManager:
         if template:
             # 選擇回應（主範本或變體）
             if use_variation and template.response_variations:
-                import random
                 response = random.choice(
                     [template.response_template] + template.response_variations
                 )
@@ -179,13 +321,12 @@ class ExpertTemplateManager:
         if not context:
             return template
         
-        result = template
-        
-        # 替換 {variable} 格式的變數
-        for key, value in context.items():
-            result = result.replace(f"{{{key}}}", str(value))
+        # 一次掃描替換 {variable} 格式的變數；未提供的變數與其他大括號保持原樣
+        def replace(match: "re.Match") -> str:
+            key = match.group(1)
+            return str(context[key]) if key in context else match.group(0)
         
-        return result
+        return TEMPLATE_VARIABLE_RE.sub(replace, template)
     
     # ============================================
     # 範本管理
@@ -197,6 +338,7 @@ class ExpertTemplateManager:
             return False
         
         self.templates[template.template_id] = template
+        self._invalidate()
         return True
     
     def update_template(
@@ -216,6 +358,7 @@ class ExpertTemplateManager:
         
         template.updated_at = datetime.now()
         template.version += 1
+        self._invalidate()
         
         return True
     
@@ -232,6 +375,7 @@ class ExpertTemplateManager:
         template.is_approved = True
         template.reviewed_by = reviewer_name
         template.review_date = datetime.now().date()
+        self._invalidate()
         
         return True
     
@@ -241,6 +385,7 @@ class ExpertTemplateManager:
             return False
         
         self.templates[template_id].is_active = False
+        self._invalidate()
         return True
     
     # ============================================
@@ -248,29 +393,39 @@ class ExpertTemplateManager:
     # ============================================
     
     def get_usage_stats(self) -> Dict[str, Any]:
-        """取得範本使用統計"""
+        """取得範本使用統計（快取，回傳的 dict 請勿修改）"""
+        if self._stats_cache is not None:
+            return self._stats_cache
+        
+        approved = active = total_usage = 0
+        by_category: Dict[str, Dict[str, int]] = {}
+        
+        # 單次走訪完成所有計數與類別統計
+        for template in self.templates.values():
+            approved += template.is_approved
+            active += template.is_active
+            total_usage += template.use_count
+            
+            category_stats = by_category.get(template.category)
+            if category_stats is None:
+                category_stats = by_category[template.category] = {"count": 0, "usage": 0}
+            category_stats["count"] += 1
+            category_stats["usage"] += template.use_count
+        
         stats = {
             "total_templates": len(self.templates),
-            "approved_templates": sum(1 for t in self.templates.values() if t.is_approved),
-            "active_templates": sum(1 for t in self.templates.values() if t.is_active),
-            "total_usage": sum(t.use_count for t in self.templates.values()),
-            "by_category": {},
+            "approved_templates": approved,
+            "active_templates": active,
+            "total_usage": total_usage,
+            "by_category": by_category,
             "top_used": []
         }
         
-        # 按類別統計
-        for template in self.templates.values():
-            cat = template.category
-            if cat not in stats["by_category"]:
-                stats["by_category"][cat] = {"count": 0, "usage": 0}
-            stats["by_category"][cat]["count"] += 1
-            stats["by_category"][cat]["usage"] += template.use_count
-        
-        # 使用最多的範本
-        sorted_templates = sorted(
+        # 使用最多的範本（只取前 10 名，不需排序全部）
+        top_templates = heapq.nlargest(
+            10,
             self.templates.values(),
-            key=lambda t: t.use_count,
-            reverse=True
+            key=lambda t: t.use_count
         )
         stats["top_used"] = [
             {
@@ -278,9 +433,10 @@ class ExpertTemplateManager:
                 "scenario_name": t.scenario_name,
                 "use_count": t.use_count
             }
-            for t in sorted_templates[:10]
+            for t in top_templates
         ]
         
+        self._stats_cache = stats
         return stats
     
     def export_templates(self) -> List[Dict[str, Any]]:
@@ -528,8 +684,17 @@ class ExpertTemplateManager:
 # 全域實例
 # ============================================
 
-# 建立全域範本管理器
-template_manager = ExpertTemplateManager()
+@functools.cache
+def get_template_manager() -> ExpertTemplateManager:
+    """取得全域範本管理器（首次使用時才建立）"""
+    return ExpertTemplateManager()
+
+
+def __getattr__(name: str):
+    # 相容舊的 expert_templates.template_manager 用法
+    if name == "template_manager":
+        return get_template_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # ============================================
@@ -544,7 +709,7 @@ def get_expert_response(
     context: Optional[Dict[str, Any]] = None
 ) -> Tuple[Optional[str], Optional[str], MessageSource]:
     """取得專家回應的便利函數"""
-    return template_manager.get_response(
+    return get_template_manager().get_response(
         category=category,
         symptom_type=symptom_type,
         score=score,
@@ -14,12 +14,23 @@ AI-CARE Lung - Google Sheet 資料庫模組
 
 import streamlit as st
 import gspread
+from google.auth.exceptions import GoogleAuthError
 from google.oauth2.service_account import Credentials
 from datetime import datetime, timedelta, date
 import json
 import hashlib
+import hmac
+import bisect
+import logging
+import os
+import threading
+import time
 from typing import Optional, Dict, List, Any, Tuple
 
+from models import PatientProfile, Compliance
+
+logger = logging.getLogger(__name__)
+
 # ============================================
 # Google Sheet 連接設定
 # ============================================
@@ -36,6 +47,63 @@ SHEET_REPORTS = "症狀回報"
 SHEET_CONVERSATIONS = "對話記錄"
 SHEET_ACHIEVEMENTS = "成就記錄"
 
+# 工作表結構：名稱 → (列數, 欄數, 標題列)
+SHEET_SCHEMAS = {
+    # 病人資料表
+    SHEET_PATIENTS: (1000, 20, [
+        "病人ID", "姓名", "性別", "年齡", "生日", 
+        "手機號碼", "手術日期", "手術類型", "癌症分期",
+        "密碼雜湊", "註冊時間", "最後登入", "狀態"
+    ]),
+    # 症狀回報表
+    SHEET_REPORTS: (10000, 30, [
+        "回報ID", "病人ID", "回報日期", "回報時間", "回報方式",
+        "疼痛分數", "疲勞分數", "呼吸困難分數", "咳嗽分數", 
+        "睡眠分數", "食慾分數", "心情分數",
+        "疼痛描述", "疲勞描述", "呼吸困難描述", "咳嗽描述",
+        "睡眠描述", "食慾描述", "心情描述",
+        "開放式回答1", "開放式回答2", "額外備註",
+        "平均分數", "最高分數項目", "建立時間"
+    ]),
+    # 對話記錄表
+    SHEET_CONVERSATIONS: (50000, 15, [
+        "訊息ID", "會話ID", "病人ID", "角色", "內容",
+        "訊息來源", "輸入方式", "範本ID",
+        "偵測意圖", "偵測情緒", "時間戳記"
+    ]),
+    # 成就記錄表
+    SHEET_ACHIEVEMENTS: (5000, 10, [
+        "記錄ID", "病人ID", "成就ID", "成就名稱", 
+        "解鎖日期", "獲得積分"
+    ]),
+}
+
+# 症狀回報表中分數與描述欄位的症狀順序
+REPORT_SYMPTOM_KEYS = ("pain", "fatigue", "dyspnea", "cough", "sleep", "appetite", "mood")
+
+# 各等級所需積分（第 i 個門檻對應等級 i+1）
+LEVEL_THRESHOLDS = (0, 50, 150, 300, 500, 800, 1200)
+
+# 病人資料表記憶體快取的有效秒數
+PATIENTS_CACHE_TTL = 30
+
+# 回報／成就記錄快取的有效秒數
+RECORDS_CACHE_TTL = 30
+
+
+@st.cache_resource
+def _authorized_client():
+    """建立並授權 gspread 客戶端（每個程序一次；失敗時不快取）"""
+    # 從 Streamlit Secrets 讀取憑證
+    credentials_dict = st.secrets["gcp_service_account"]
+    
+    credentials = Credentials.from_service_account_info(
+        credentials_dict,
+        scopes=SCOPES
+    )
+    
+    return gspread.authorize(credentials)
+
 
 def get_google_client():
     """
@@ -44,16 +112,7 @@ def get_google_client():
     憑證從 Streamlit Secrets 讀取
     """
     try:
-        # 從 Streamlit Secrets 讀取憑證
-        credentials_dict = st.secrets["gcp_service_account"]
-        
-        credentials = Credentials.from_service_account_info(
-            credentials_dict,
-            scopes=SCOPES
-        )
-        
-        client = gspread.authorize(credentials)
-        return client
+        return _authorized_client()
     
     except Exception as e:
         st.error(f"無法連接 Google Sheets: {e}")
@@ -87,46 +146,28 @@ def init_spreadsheet():
         return False
     
     try:
-        existing_sheets = [ws.title for ws in spreadsheet.worksheets()]
-        
-        # 病人資料表
-        if SHEET_PATIENTS not in existing_sheets:
-            ws = spreadsheet.add_worksheet(title=SHEET_PATIENTS, rows=1000, cols=20)
-            ws.append_row([
-                "病人ID", "姓名", "性別", "年齡", "生日", 
-                "手機號碼", "手術日期", "手術類型", "癌症分期",
-                "密碼雜湊", "註冊時間", "最後登入", "狀態"
-            ])
-        
-        # 症狀回報表
-        if SHEET_REPORTS not in existing_sheets:
-            ws = spreadsheet.add_worksheet(title=SHEET_REPORTS, rows=10000, cols=30)
-            ws.append_row([
-                "回報ID", "病人ID", "回報日期", "回報時間", "回報方式",
-                "疼痛分數", "疲勞分數", "呼吸困難分數", "咳嗽分數", 
-                "睡眠分數", "食慾分數", "心情分數",
-                "疼痛描述", "疲勞描述", "呼吸困難描述", "咳嗽描述",
-                "睡眠描述", "食慾描述", "心情描述",
-                "開放式回答1", "開放式回答2", "額外備註",
-                "平均分數", "最高分數項目", "建立時間"
-            ])
-        
-        # 對話記錄表
-        if SHEET_CONVERSATIONS not in existing_sheets:
-            ws = spreadsheet.add_worksheet(title=SHEET_CONVERSATIONS, rows=50000, cols=15)
-            ws.append_row([
-                "訊息ID", "會話ID", "病人ID", "角色", "內容",
-                "訊息來源", "輸入方式", "範本ID",
-                "偵測意圖", "偵測情緒", "時間戳記"
-            ])
-        
-        # 成就記錄表
-        if SHEET_ACHIEVEMENTS not in existing_sheets:
-            ws = spreadsheet.add_worksheet(title=SHEET_ACHIEVEMENTS, rows=5000, cols=10)
-            ws.append_row([
-                "記錄ID", "病人ID", "成就ID", "成就名稱", 
-                "解鎖日期", "獲得積分"
-            ])
+        existing_sheets = {ws.title for ws in spreadsheet.worksheets()}
+        missing = [name for name in SHEET_SCHEMAS if name not in existing_sheets]
+        
+        if missing:
+            # 一次建立所有缺少的工作表，再一次寫入全部標題列
+            spreadsheet.batch_update({"requests": [
+                {"addSheet": {"properties": {
+                    "title": name,
+                    "gridProperties": {
+                        "rowCount": SHEET_SCHEMAS[name][0],
+                        "columnCount": SHEET_SCHEMAS[name][1]
+                    }
+                }}}
+                for name in missing
+            ]})
+            spreadsheet.values_batch_update({
+                "valueInputOption": "RAW",
+                "data": [
+                    {"range": f"'{name}'!A1", "values": [SHEET_SCHEMAS[name][2]]}
+                    for name in missing
+                ]
+            })
         
         return True
     
@@ -135,18 +176,118 @@ def init_spreadsheet():
         return False
 
 
+def now_str() -> str:
+    """目前時間字串（YYYY-MM-DD HH:MM:SS，與 strftime 結果相同但較快）"""
+    return datetime.now().isoformat(sep=" ", timespec="seconds")
+
+
+def id_timestamp(moment: datetime) -> str:
+    """ID 用的緊湊時間字串（YYYYMMDDHHMMSS，與 strftime 結果相同但較快）"""
+    return (
+        f"{moment.year:04d}{moment.month:02d}{moment.day:02d}"
+        f"{moment.hour:02d}{moment.minute:02d}{moment.second:02d}"
+    )
+
+
+def parse_sheet_date(value: str) -> date:
+    """解析工作表中的日期（YYYY-MM-DD 走 C 實作的快速路徑，未補零的日期才用 strptime）"""
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+# 工作表記錄快取：(試算表ID, 工作表名稱) → (載入時間, 記錄列表, {欄位: {值: 記錄列表}})
+_RECORDS_CACHE: Dict[Tuple[str, str], Tuple[float, List[Dict], Dict[str, Dict[Any, List[Dict]]]]] = {}
+# 每張工作表一把下載鎖：不同工作表可平行下載，同一張表只下載一次
+_RECORDS_LOCKS: Dict[Tuple[str, str], threading.Lock] = {}
+_RECORDS_LOCKS_GUARD = threading.Lock()
+
+
+def _records_entry(ws, ttl: float):
+    """取得工作表的快取項目（過期或不存在時重新下載整張表）"""
+    key = (ws.spreadsheet.id, ws.title)
+    cached = _RECORDS_CACHE.get(key)
+    if cached is not None and time.monotonic() - cached[0] < ttl:
+        return cached
+    
+    with _RECORDS_LOCKS_GUARD:
+        lock = _RECORDS_LOCKS.setdefault(key, threading.Lock())
+    
+    with lock:
+        # 等待期間其他執行緒可能已下載完成（例如儀表板平行載入回報與順從度）
+        cached = _RECORDS_CACHE.get(key)
+        if cached is not None and time.monotonic() - cached[0] < ttl:
+            return cached
+        
+        cached = (time.monotonic(), ws.get_all_records(), {})
+        _RECORDS_CACHE[key] = cached
+        return cached
+
+
+def _cached_records_by(ws, column: str, ttl: float = RECORDS_CACHE_TTL) -> Dict[Any, List[Dict]]:
+    """依欄位值分組的快取記錄（每次下載只分組一次，組內維持工作表順序）"""
+    _, records, indexes = _records_entry(ws, ttl)
+    index = indexes.get(column)
+    if index is None:
+        index = {}
+        for record in records:
+            index.setdefault(record.get(column), []).append(record)
+        indexes[column] = index
+    return index
+
+
+def _append_cached_records(ws, rows: List[list]):
+    """寫入成功後把新列直接加進快取，下一次讀取不必重新下載整張表"""
+    cached = _RECORDS_CACHE.get((ws.spreadsheet.id, ws.title))
+    if cached is None:
+        return
+    headers = SHEET_SCHEMAS[ws.title][2]
+    _, records, indexes = cached
+    for row in rows:
+        record = dict(zip(headers, row))
+        records.append(record)
+        for column, index in indexes.items():
+            index.setdefault(record.get(column), []).append(record)
+
+
 # ============================================
 # 密碼處理
 # ============================================
 
+# scrypt 參數（單次雜湊約數十毫秒）
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+
+def _scrypt(password: str, salt: bytes) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P)
+
+
 def hash_password(password: str) -> str:
-    """密碼雜湊（使用 SHA-256）"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """密碼雜湊（scrypt + 隨機鹽，格式：scrypt$鹽$雜湊）"""
+    salt = os.urandom(16)
+    return f"scrypt${salt.hex()}${_scrypt(password, salt).hex()}"
 
 
 def verify_password(password: str, hashed: str) -> bool:
-    """驗證密碼"""
-    return hash_password(password) == hashed
+    """
+    驗證密碼（固定時間比較）
+    
+    相容舊版以 SHA-256 儲存的密碼雜湊
+    """
+    if hashed.startswith("scrypt$"):
+        try:
+            _, salt, digest = hashed.split("$")
+            expected = bytes.fromhex(digest)
+            actual = _scrypt(password, bytes.fromhex(salt))
+        except ValueError:
+            return False
+        return hmac.compare_digest(actual, expected)
+    
+    legacy = hashlib.sha256(password.encode()).hexdigest()
+    return hmac.compare_digest(legacy, hashed)
 
 
 # ============================================
@@ -158,15 +299,40 @@ class PatientManager:
     
     def __init__(self):
         self.spreadsheet = get_spreadsheet()
+        # 工作表物件快取（取得成功後重複使用，省去每次操作的中繼資料查詢）
+        self._patients_ws = None
+        # 病人資料快取：(載入時間, {病人ID: (列號, 列資料)})
+        self._patients_cache: Optional[Tuple[float, Dict[str, Tuple[int, list]]]] = None
     
     def _get_patients_sheet(self):
         """取得病人資料工作表"""
+        if self._patients_ws is not None:
+            return self._patients_ws
         if not self.spreadsheet:
             return None
         try:
-            return self.spreadsheet.worksheet(SHEET_PATIENTS)
+            self._patients_ws = self.spreadsheet.worksheet(SHEET_PATIENTS)
         except:
             return None
+        return self._patients_ws
+    
+    def _load_patients(self, ws) -> Dict[str, Tuple[int, list]]:
+        """一次讀取整張病人資料表並建立索引（快取 PATIENTS_CACHE_TTL 秒）"""
+        cached = self._patients_cache
+        if cached is not None and time.monotonic() - cached[0] < PATIENTS_CACHE_TTL:
+            return cached[1]
+        
+        patients: Dict[str, Tuple[int, list]] = {}
+        for row_number, row in enumerate(ws.get_all_values()[1:], start=2):
+            if row and row[0]:
+                patients.setdefault(row[0], (row_number, row))
+        
+        self._patients_cache = (time.monotonic(), patients)
+        return patients
+    
+    def _invalidate_patients(self):
+        """病人資料異動後清除快取"""
+        self._patients_cache = None
     
     def register_patient(
         self,
@@ -192,13 +358,15 @@ class PatientManager:
             return False, "無法連接資料庫"
         
         try:
-            # 檢查病人ID是否已存在
-            existing = ws.findall(patient_id, in_column=1)
-            if existing:
+            # 檢查病人ID是否已存在（先查記憶體快取，未命中才查詢工作表）
+            cached = self._patients_cache
+            if cached is not None and patient_id in cached[1]:
+                return False, "此病歷號已註冊"
+            if ws.find(patient_id, in_column=1):
                 return False, "此病歷號已註冊"
             
             # 新增病人資料
-            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            now = now_str()
             ws.append_row([
                 patient_id,
                 name,
@@ -214,13 +382,14 @@ class PatientManager:
                 now,  # 最後登入
                 "active"  # 狀態
             ])
+            self._invalidate_patients()
             
             return True, "註冊成功！"
         
         except Exception as e:
             return False, f"註冊失敗: {e}"
     
-    def login(self, patient_id: str, password: str) -> Tuple[bool, Optional[Dict]]:
+    def login(self, patient_id: str, password: str) -> Tuple[bool, Optional[PatientProfile]]:
         """
         病人登入驗證
         
@@ -232,13 +401,11 @@ class PatientManager:
             return False, None
         
         try:
-            # 尋找病人
-            cell = ws.find(patient_id, in_column=1)
-            if not cell:
+            # 尋找病人（從快取的病人資料表）
+            found = self._load_patients(ws).get(patient_id)
+            if not found:
                 return False, None
-            
-            # 取得該行資料
-            row = ws.row_values(cell.row)
+            row_number, row = found
             
             # 驗證密碼
             stored_hash = row[9] if len(row) > 9 else ""
@@ -246,25 +413,25 @@ class PatientManager:
                 return False, None
             
             # 更新最後登入時間
-            ws.update_cell(cell.row, 12, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            ws.update_cell(row_number, 12, now_str())
             
             # 計算術後天數
-            surgery_date = datetime.strptime(row[6], "%Y-%m-%d").date() if row[6] else date.today()
+            surgery_date = parse_sheet_date(row[6]) if row[6] else date.today()
             post_op_day = (date.today() - surgery_date).days
             
             # 回傳病人資料
-            patient_data = {
-                "id": row[0],
-                "name": row[1],
-                "gender": row[2],
-                "age": int(row[3]) if row[3] else 0,
-                "birthday": row[4],
-                "phone": row[5],
-                "surgery_date": surgery_date,
-                "surgery_type": row[7],
-                "cancer_stage": row[8],
-                "post_op_day": post_op_day
-            }
+            patient_data = PatientProfile(
+                id=row[0],
+                name=row[1],
+                gender=row[2],
+                age=int(row[3]) if row[3] else 0,
+                birthday=row[4],
+                phone=row[5],
+                surgery_date=surgery_date,
+                surgery_type=row[7],
+                cancer_stage=row[8],
+                post_op_day=post_op_day
+            )
             
             return True, patient_data
         
@@ -272,32 +439,32 @@ class PatientManager:
             st.error(f"登入錯誤: {e}")
             return False, None
     
-    def get_patient(self, patient_id: str) -> Optional[Dict]:
+    def get_patient(self, patient_id: str) -> Optional[PatientProfile]:
         """取得病人資料"""
         ws = self._get_patients_sheet()
         if not ws:
             return None
         
         try:
-            cell = ws.find(patient_id, in_column=1)
-            if not cell:
+            found = self._load_patients(ws).get(patient_id)
+            if not found:
                 return None
             
-            row = ws.row_values(cell.row)
+            _, row = found
             
-            surgery_date = datetime.strptime(row[6], "%Y-%m-%d").date() if row[6] else date.today()
+            surgery_date = parse_sheet_date(row[6]) if row[6] else date.today()
             post_op_day = (date.today() - surgery_date).days
             
-            return {
-                "id": row[0],
-                "name": row[1],
-                "gender": row[2],
-                "age": int(row[3]) if row[3] else 0,
-                "surgery_date": surgery_date,
-                "surgery_type": row[7],
-                "cancer_stage": row[8],
-                "post_op_day": post_op_day
-            }
+            return PatientProfile(
+                id=row[0],
+                name=row[1],
+                gender=row[2],
+                age=int(row[3]) if row[3] else 0,
+                surgery_date=surgery_date,
+                surgery_type=row[7],
+                cancer_stage=row[8],
+                post_op_day=post_op_day
+            )
         except:
             return None
     
@@ -308,9 +475,10 @@ class PatientManager:
             return False
         
         try:
-            cell = ws.find(patient_id, in_column=1)
-            if not cell:
+            found = self._load_patients(ws).get(patient_id)
+            if not found:
                 return False
+            row_number, _ = found
             
             # 欄位對應
             column_map = {
@@ -319,10 +487,17 @@ class PatientManager:
                 "cancer_stage": 9
             }
             
-            for field, value in updates.items():
-                if field in column_map:
-                    ws.update_cell(cell.row, column_map[field], value)
+            # 所有欄位一次批次寫入
+            data = [
+                {"range": gspread.utils.rowcol_to_a1(row_number, column_map[field]), "values": [[value]]}
+                for field, value in updates.items()
+                if field in column_map
+            ]
+            if data:
+                # 與 update_cell 相同以 USER_ENTERED 寫入
+                ws.batch_update(data, value_input_option="USER_ENTERED")
             
+            self._invalidate_patients()
             return True
         except:
             return False
@@ -337,15 +512,20 @@ class ReportManager:
     
     def __init__(self):
         self.spreadsheet = get_spreadsheet()
+        # 工作表物件快取（取得成功後重複使用）
+        self._reports_ws = None
     
     def _get_reports_sheet(self):
         """取得症狀回報工作表"""
+        if self._reports_ws is not None:
+            return self._reports_ws
         if not self.spreadsheet:
             return None
         try:
-            return self.spreadsheet.worksheet(SHEET_REPORTS)
+            self._reports_ws = self.spreadsheet.worksheet(SHEET_REPORTS)
         except:
             return None
+        return self._reports_ws
     
     def save_report(
         self,
@@ -377,7 +557,9 @@ class ReportManager:
         
         try:
             now = datetime.now()
-            report_id = f"RPT_{patient_id}_{now.strftime('%Y%m%d%H%M%S')}"
+            date_str = now.date().isoformat()
+            time_str = now.time().isoformat(timespec="seconds")
+            report_id = f"RPT_{patient_id}_{id_timestamp(now)}"
             
             # 計算平均分數
             score_values = list(scores.values())
@@ -389,32 +571,21 @@ class ReportManager:
             row_data = [
                 report_id,
                 patient_id,
-                now.strftime("%Y-%m-%d"),
-                now.strftime("%H:%M:%S"),
+                date_str,
+                time_str,
                 method,
-                scores.get("pain", 0),
-                scores.get("fatigue", 0),
-                scores.get("dyspnea", 0),
-                scores.get("cough", 0),
-                scores.get("sleep", 0),
-                scores.get("appetite", 0),
-                scores.get("mood", 0),
-                descriptions.get("pain", ""),
-                descriptions.get("fatigue", ""),
-                descriptions.get("dyspnea", ""),
-                descriptions.get("cough", ""),
-                descriptions.get("sleep", ""),
-                descriptions.get("appetite", ""),
-                descriptions.get("mood", ""),
+                *[scores.get(key, 0) for key in REPORT_SYMPTOM_KEYS],
+                *[descriptions.get(key, "") for key in REPORT_SYMPTOM_KEYS],
                 open_ended[0] if len(open_ended) > 0 else "",
                 open_ended[1] if len(open_ended) > 1 else "",
                 descriptions.get("additional", ""),
                 round(avg_score, 2),
                 max_symptom,
-                now.strftime("%Y-%m-%d %H:%M:%S")
+                f"{date_str} {time_str}"
             ]
             
             ws.append_row(row_data)
+            _append_cached_records(ws, [row_data])
             
             return True, report_id
         
@@ -431,11 +602,11 @@ class ReportManager:
         try:
             today = datetime.now().strftime("%Y-%m-%d")
             
-            # 取得所有資料
-            records = ws.get_all_records()
+            # 只看該病人的資料
+            records = _cached_records_by(ws, "病人ID").get(patient_id, [])
             
             for record in records:
-                if record.get("病人ID") == patient_id and record.get("回報日期") == today:
+                if record.get("回報日期") == today:
                     return {
                         "report_id": record.get("回報ID"),
                         "date": record.get("回報日期"),
@@ -463,13 +634,13 @@ class ReportManager:
             return []
         
         try:
-            records = ws.get_all_records()
+            records = _cached_records_by(ws, "病人ID").get(patient_id, [])
             patient_reports = []
             
             cutoff_date = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
             
             for record in records:
-                if record.get("病人ID") == patient_id and record.get("回報日期", "") >= cutoff_date:
+                if record.get("回報日期", "") >= cutoff_date:
                     patient_reports.append({
                         "report_id": record.get("回報ID"),
                         "date": record.get("回報日期"),
@@ -494,7 +665,7 @@ class ReportManager:
         except:
             return []
     
-    def get_compliance_stats(self, patient_id: str, surgery_date: date) -> Dict:
+    def get_compliance_stats(self, patient_id: str, surgery_date: date) -> Compliance:
         """計算順從度統計"""
         reports = self.get_patient_reports(patient_id, days=90)
         
@@ -502,26 +673,25 @@ class ReportManager:
         total_days = (date.today() - surgery_date).days
         total_days = max(1, total_days)  # 至少1天
         
-        # 計算完成天數
-        completed_dates = set(r["date"] for r in reports)
+        # 計算完成天數（日期只解析一次）
+        completed_dates = set()
+        for r in reports:
+            try:
+                completed_dates.add(parse_sheet_date(r["date"]))
+            except (TypeError, ValueError):
+                continue
         total_completed = len(completed_dates)
         
-        # 計算連續天數
+        # 計算連續天數（今天還沒回報則從昨天開始算）
         current_streak = 0
         check_date = date.today()
+        if check_date not in completed_dates:
+            check_date -= timedelta(days=1)
         
-        while check_date.strftime("%Y-%m-%d") in completed_dates:
+        while check_date in completed_dates:
             current_streak += 1
             check_date -= timedelta(days=1)
         
-        # 如果今天還沒回報，從昨天開始算
-        if date.today().strftime("%Y-%m-%d") not in completed_dates:
-            current_streak = 0
-            check_date = date.today() - timedelta(days=1)
-            while check_date.strftime("%Y-%m-%d") in completed_dates:
-                current_streak += 1
-                check_date -= timedelta(days=1)
-        
         # 計算積分
         base_points = total_completed * 10
         streak_bonus = 0
@@ -535,20 +705,16 @@ class ReportManager:
         total_points = base_points + streak_bonus
         
         # 計算等級
-        level = 1
-        thresholds = [0, 50, 150, 300, 500, 800, 1200]
-        for i, threshold in enumerate(thresholds):
-            if total_points >= threshold:
-                level = i + 1
-        
-        return {
-            "total_days": total_days,
-            "total_completed": total_completed,
-            "current_streak": current_streak,
-            "completion_rate": round(total_completed / total_days * 100, 1),
-            "points": total_points,
-            "level": level
-        }
+        level = max(1, bisect.bisect_right(LEVEL_THRESHOLDS, total_points))
+        
+        return Compliance(
+            total_days=total_days,
+            total_completed=total_completed,
+            current_streak=current_streak,
+            completion_rate=round(total_completed / total_days * 100, 1),
+            points=total_points,
+            level=level
+        )
 
 
 # ============================================
@@ -560,15 +726,20 @@ class ConversationManager:
     
     def __init__(self):
         self.spreadsheet = get_spreadsheet()
+        # 工作表物件快取（取得成功後重複使用）
+        self._conversations_ws = None
     
     def _get_conversations_sheet(self):
         """取得對話記錄工作表"""
+        if self._conversations_ws is not None:
+            return self._conversations_ws
         if not self.spreadsheet:
             return None
         try:
-            return self.spreadsheet.worksheet(SHEET_CONVERSATIONS)
+            self._conversations_ws = self.spreadsheet.worksheet(SHEET_CONVERSATIONS)
         except:
             return None
+        return self._conversations_ws
     
     def save_message(
         self,
@@ -589,7 +760,7 @@ class ConversationManager:
         
         try:
             now = datetime.now()
-            message_id = f"MSG_{now.strftime('%Y%m%d%H%M%S%f')}"
+            message_id = f"MSG_{id_timestamp(now)}{now.microsecond:06d}"
             
             ws.append_row([
                 message_id,
@@ -602,7 +773,7 @@ class ConversationManager:
                 template_id,
                 intent,
                 emotion,
-                now.strftime("%Y-%m-%d %H:%M:%S")
+                now.isoformat(sep=" ", timespec="seconds")
             ])
             
             return True
@@ -614,6 +785,10 @@ class ConversationManager:
 # 成就管理
 # ============================================
 
+# 成就類型 → 判斷解鎖時比較的 Compliance 欄位（special 類型需另行判斷）
+ACHIEVEMENT_STAT_FIELDS = {"streak": "current_streak", "completion": "total_completed"}
+
+
 class AchievementManager:
     """成就管理"""
     
@@ -629,17 +804,31 @@ class AchievementManager:
         "first_description": {"name": "詳細描述者", "icon": "✍️", "requirement": 1, "type": "special", "points": 15},
     }
     
+    # 可自動解鎖的成就：(成就ID, 成就定義, 比較的 Compliance 欄位)，維持 ACHIEVEMENTS 順序
+    UNLOCK_RULES = tuple(
+        (achievement_id, achievement, ACHIEVEMENT_STAT_FIELDS[achievement["type"]])
+        for achievement_id, achievement in ACHIEVEMENTS.items()
+        if achievement["type"] in ACHIEVEMENT_STAT_FIELDS
+    )
+    
     def __init__(self):
         self.spreadsheet = get_spreadsheet()
+        # 工作表物件快取（取得成功後重複使用）
+        self._achievements_ws = None
+        # 成就檢查會在背景執行緒執行，避免同一程序重複解鎖
+        self._unlock_lock = threading.Lock()
     
     def _get_achievements_sheet(self):
         """取得成就記錄工作表"""
+        if self._achievements_ws is not None:
+            return self._achievements_ws
         if not self.spreadsheet:
             return None
         try:
-            return self.spreadsheet.worksheet(SHEET_ACHIEVEMENTS)
+            self._achievements_ws = self.spreadsheet.worksheet(SHEET_ACHIEVEMENTS)
         except:
             return None
+        return self._achievements_ws
     
     def get_patient_achievements(self, patient_id: str) -> List[Dict]:
         """取得病人已解鎖的成就"""
@@ -648,82 +837,77 @@ class AchievementManager:
             return []
         
         try:
-            records = ws.get_all_records()
+            records = _cached_records_by(ws, "病人ID").get(patient_id, [])
             unlocked = []
             
             for record in records:
-                if record.get("病人ID") == patient_id:
-                    unlocked.append({
-                        "id": record.get("成就ID"),
-                        "name": record.get("成就名稱"),
-                        "date": record.get("解鎖日期"),
-                        "points": record.get("獲得積分")
-                    })
+                unlocked.append({
+                    "id": record.get("成就ID"),
+                    "name": record.get("成就名稱"),
+                    "date": record.get("解鎖日期"),
+                    "points": record.get("獲得積分")
+                })
             
             return unlocked
         except:
             return []
     
-    def check_and_unlock(self, patient_id: str, stats: Dict) -> List[Dict]:
+    def check_and_unlock(self, patient_id: str, stats: Compliance) -> List[Dict]:
         """
         檢查並解鎖成就
         
         Returns:
             新解鎖的成就列表
         """
-        ws = self._get_achievements_sheet()
-        if not ws:
-            return []
-        
-        # 取得已解鎖成就
-        unlocked_ids = [a["id"] for a in self.get_patient_achievements(patient_id)]
-        
-        new_unlocks = []
-        
-        for achievement_id, achievement in self.ACHIEVEMENTS.items():
-            if achievement_id in unlocked_ids:
-                continue
-            
-            should_unlock = False
+        with self._unlock_lock:
+            ws = self._get_achievements_sheet()
+            if not ws:
+                return []
             
-            if achievement["type"] == "streak":
-                if stats.get("current_streak", 0) >= achievement["requirement"]:
-                    should_unlock = True
+            # 取得已解鎖成就
+            unlocked_ids = {a["id"] for a in self.get_patient_achievements(patient_id)}
             
-            elif achievement["type"] == "completion":
-                if stats.get("total_completed", 0) >= achievement["requirement"]:
-                    should_unlock = True
-            
-            if should_unlock:
-                # 解鎖成就
-                try:
-                    now = datetime.now()
-                    record_id = f"ACH_{patient_id}_{achievement_id}_{now.strftime('%Y%m%d')}"
-                    
-                    ws.append_row([
-                        record_id,
+            now = datetime.now()
+            unlock_date = now.date().isoformat()
+            id_date = id_timestamp(now)[:8]
+            rows = []
+            new_unlocks = []
+            
+            for achievement_id, achievement, stat in self.UNLOCK_RULES:
+                if achievement_id in unlocked_ids:
+                    continue
+                
+                if getattr(stats, stat) >= achievement["requirement"]:
+                    rows.append([
+                        f"ACH_{patient_id}_{achievement_id}_{id_date}",
                         patient_id,
                         achievement_id,
                         achievement["name"],
-                        now.strftime("%Y-%m-%d"),
+                        unlock_date,
                         achievement["points"]
                     ])
-                    
                     new_unlocks.append({
                         "id": achievement_id,
                         "name": achievement["name"],
                         "icon": achievement["icon"],
                         "points": achievement["points"]
                     })
+            
+            # 一次寫入所有新解鎖的成就
+            if rows:
+                try:
+                    ws.append_rows(rows)
                 except:
-                    pass
-        
-        return new_unlocks
+                    return []
+                _append_cached_records(ws, rows)
+            
+            return new_unlocks
     
     def get_all_achievements_status(self, patient_id: str) -> List[Dict]:
         """取得所有成就的狀態"""
         unlocked = self.get_patient_achievements(patient_id)
-        unlocked_ids = [a["id"] for a in unlocked]
+        # 成就ID → 解鎖日期（重複記錄時以最早的一筆為準）
+        dates_by_id = {u["id"]: u["date"] for u in reversed(unlocked)}
         
         all_achievements = []
         
@@ -733,16 +917,10 @@ class AchievementManager:
                 "name": achievement["name"],
                 "icon": achievement["icon"],
                 "points": achievement["points"],
-                "unlocked": achievement_id in unlocked_ids,
-                "date": None
+                "unlocked": achievement_id in dates_by_id,
+                "date": dates_by_id.get(achievement_id)
             }
             
-            # 找到解鎖日期
-            for u in unlocked:
-                if u["id"] == achievement_id:
-                    status["date"] = u["date"]
-                    break
-            
             all_achievements.append(status)
         
         return all_achievements
@@ -777,6 +955,17 @@ def get_achievement_manager():
 # 測試連線
 # ============================================
 
+@st.cache_resource(ttl=60)
+def check_connection() -> bool:
+    """檢查 Google Sheets 連線（快取 60 秒，不顯示訊息）"""
+    try:
+        return get_patient_manager().spreadsheet is not None
+    except (gspread.exceptions.GSpreadException, GoogleAuthError, OSError, KeyError) as e:
+        # OSError 涵蓋連線逾時與網路錯誤
+        logger.warning("Google Sheets 連線檢查失敗", exc_info=e)
+        return False
+
+
 def test_connection() -> bool:
     """測試 Google Sheets 連線"""
     try:
@@ -110,7 +110,7 @@ class UrgencyLevel(Enum):
 # 新增：對話訊息類別
 # ============================================
 
-@dataclass
+@dataclass(slots=True)
 class ConversationMessage:
     """
     對話訊息 - 分離儲存病人輸入和 AI 回應
@@ -182,7 +182,7 @@ class ConversationMessage:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class ConversationSession:
     """
     對話會話 - 記錄一次完整的對話過程
@@ -242,7 +242,7 @@ class ConversationSession:
 # 新增：開放式問題回應
 # ============================================
 
-@dataclass
+@dataclass(slots=True)
 class OpenEndedResponse:
     """
     開放式問題回應 - 收集病人自然語言描述
@@ -308,7 +308,7 @@ class OpenEndedResponse:
 # 新增：專家回應範本
 # ============================================
 
-@dataclass
+@dataclass(slots=True)
 class ExpertResponseTemplate:
     """
     專家回應範本 - 由護理師/醫師撰寫
@@ -399,10 +399,34 @@ class Patient:
     
     @property
     def age(self) -> int:
-        today = datetime.now().date()
-        return today.year - self.birth_date.year - (
-            (today.month, today.day) < (self.birth_date.month, self.birth_date.day)
-        )
+        return calculate_age(self.birth_date)
+
+
+@dataclass(slots=True)
+class PatientProfile:
+    """登入中的病人資料（存放於 session_state）"""
+    id: str
+    name: str
+    gender: str
+    age: int
+    surgery_date: date
+    surgery_type: str
+    cancer_stage: str
+    post_op_day: int = 0
+    birthday: str = ""
+    phone: str = ""
+
+
+@dataclass(slots=True)
+class Compliance:
+    """順從度統計"""
+    total_days: int = 1
+    total_completed: int = 0
+    current_streak: int = 0
+    best_streak: int = 0
+    completion_rate: float = 0.0
+    points: int = 0
+    level: int = 1
 
 
 @dataclass
@@ -806,3 +830,10 @@ def generate_response_id() -> str:
 def generate_report_id() -> str:
     """生成回報 ID"""
     return f"rpt_{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+def calculate_age(birth_date: date, today: Optional[date] = None) -> int:
+    """計算足歲年齡（生日未到則減一歲）"""
+    today = today or date.today()
+    return today.year - birth_date.year - (
+        (today.month, today.day) < (birth_date.month, birth_date.day)
+    )
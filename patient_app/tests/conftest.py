@@ -0,0 +1,6 @@
+"""測試共用設定：讓測試可直接匯入 patient_app 下的模組"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
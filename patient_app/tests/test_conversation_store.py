@@ -0,0 +1,84 @@
+"""對話儲存：統計與關鍵字偵測"""
+
+import random
+
+from conversation_store import (
+    ConversationStore, EMOTION_KEYWORDS, INTENT_KEYWORDS, SYMPTOM_KEYWORDS, URGENCY_KEYWORDS,
+    detect_all, find_keywords,
+)
+from models import EmotionCategory, IntentCategory, UrgencyLevel
+
+
+def test_patient_stats_counts_only_patient_messages():
+    store = ConversationStore()
+    store.start_session("P001")
+    store.add_patient_message("P001", "傷口痛")
+    store.add_patient_message("P001", "好累 擔心")
+    store.add_ai_message("P001", "收到")
+    store.add_patient_message("P002", "還好")
+    
+    stats = store.get_patient_stats("P001")
+    
+    assert stats["total_messages"] == 2
+    assert stats["total_words"] == 3
+    assert stats["avg_words_per_message"] == 1.5
+    assert store.get_patient_stats("P003")["total_messages"] == 0
+
+
+def test_annotation_export_leaves_annotator_fields_empty():
+    store = ConversationStore()
+    store.start_session("P001")
+    message = store.add_patient_message("P001", "傷口痛")
+    store.add_ai_message("P001", "收到")
+    
+    records = store.export_for_annotation()
+    
+    assert [r["message_id"] for r in records] == [message.message_id]
+    assert records[0]["annotator_id"] is None
+    assert records[0]["annotation_time"] is None
+    
+    # 回傳副本：修改結果不影響下一次匯出
+    records[0]["annotated_intent"] = "symptom_report"
+    assert store.export_for_annotation()[0]["annotated_intent"] is None
+
+
+def substring_match(table, text, default):
+    """逐一以子字串比對的舊版偵測方式，作為單次掃描的對照"""
+    for label, keywords in table:
+        if any(kw in text for kw in keywords):
+            return label
+    return default
+
+
+def assert_same_as_substring_scan(store, text):
+    assert store._detect_intent(text) == substring_match(INTENT_KEYWORDS, text, IntentCategory.OTHER)
+    assert store._detect_emotion(text) == substring_match(EMOTION_KEYWORDS, text, EmotionCategory.NEUTRAL)
+    assert store._detect_urgency(text) == substring_match(URGENCY_KEYWORDS, text, UrgencyLevel.NORMAL)
+    assert detect_all(text) == (store._detect_intent(text), store._detect_emotion(text), store._detect_urgency(text))
+    assert store._extract_symptoms(text) == [
+        symptom for symptom, keywords in SYMPTOM_KEYWORDS if any(kw in text for kw in keywords)
+    ]
+
+
+def test_keyword_scan_handles_overlapping_keywords():
+    store = ConversationStore()
+    
+    assert find_keywords("謝謝你") >= {"謝謝", "謝"}
+    assert find_keywords("今天非常痛") >= {"今天", "非常痛"}
+    for text in ("謝謝你", "今天非常痛", "發高燒還在發燒", "受不了了", "", "沒事"):
+        assert_same_as_substring_scan(store, text)
+
+
+def test_keyword_scan_matches_substring_detection_on_random_text():
+    store = ConversationStore()
+    keywords = sorted({
+        kw for table in (INTENT_KEYWORDS, EMOTION_KEYWORDS, URGENCY_KEYWORDS, SYMPTOM_KEYWORDS)
+        for _, kws in table for kw in kws
+    })
+    # 關鍵字片段與一般字元混合，產生重疊與跨關鍵字的組合
+    pieces = keywords + [kw[:1] for kw in keywords] + [kw[1:] for kw in keywords] + list("的了我很好，")
+    rng = random.Random(1230)
+    
+    for _ in range(500):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 8)))
+        assert_same_as_substring_scan(store, text)
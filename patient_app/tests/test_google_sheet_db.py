@@ -0,0 +1,260 @@
+"""Google Sheet 資料庫：記錄快取、病人資料與密碼雜湊（以記憶體中的假工作表測試）"""
+
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("gspread")
+pytest.importorskip("google.oauth2")
+
+import google_sheet_db as g
+
+
+class FakeWorksheet:
+    """記憶體中的工作表，記錄整張表被下載的次數"""
+    
+    def __init__(self, spreadsheet, title, headers):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.rows = [list(headers)]
+        self.downloads = 0
+        self.finds = 0
+    
+    def get_all_records(self):
+        self.downloads += 1
+        headers = self.rows[0]
+        return [dict(zip(headers, row)) for row in self.rows[1:]]
+    
+    def get_all_values(self):
+        self.downloads += 1
+        return [list(row) for row in self.rows]
+    
+    def find(self, query, in_column=None):
+        self.finds += 1
+        for row in self.rows[1:]:
+            if row[in_column - 1] == query:
+                return row
+        return None
+    
+    def update_cell(self, row, col, value):
+        self.rows[row - 1][col - 1] = value
+    
+    def append_row(self, row, **kwargs):
+        self.rows.append(list(row))
+    
+    def append_rows(self, rows, **kwargs):
+        self.rows.extend(list(row) for row in rows)
+
+
+class FakeSpreadsheet:
+    def __init__(self):
+        self.id = "test-spreadsheet"
+        self.sheets = {
+            name: FakeWorksheet(self, name, headers)
+            for name, (_, _, headers) in g.SHEET_SCHEMAS.items()
+        }
+    
+    def worksheet(self, name):
+        return self.sheets[name]
+
+
+@pytest.fixture
+def spreadsheet(monkeypatch):
+    spreadsheet = FakeSpreadsheet()
+    monkeypatch.setattr(g, "get_spreadsheet", lambda: spreadsheet)
+    monkeypatch.setattr(g, "_RECORDS_CACHE", {})
+    return spreadsheet
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可手動推進的 time.monotonic"""
+    now = [1000.0]
+    monkeypatch.setattr(g, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def report_row(report_id, patient_id, day):
+    row = [report_id, patient_id, day, "08:00:00", "ai_chat"] + [3] * 7
+    row += [""] * 10 + [3.0, "pain", f"{day} 08:00:00"]
+    return row
+
+
+# ============================================
+# 回報／成就記錄快取
+# ============================================
+
+def test_records_are_downloaded_once_per_ttl(spreadsheet, clock):
+    reports = spreadsheet.sheets[g.SHEET_REPORTS]
+    reports.rows.append(report_row("R1", "P001", g.date.today().isoformat()))
+    rm = g.ReportManager()
+    
+    assert len(rm.get_patient_reports("P001")) == 1
+    assert rm.get_today_report("P001")["report_id"] == "R1"
+    assert reports.downloads == 1
+    
+    clock[0] += g.RECORDS_CACHE_TTL
+    rm.get_patient_reports("P001")
+    assert reports.downloads == 2
+
+
+def test_saved_report_is_added_to_warm_cache(spreadsheet, clock):
+    reports = spreadsheet.sheets[g.SHEET_REPORTS]
+    rm = g.ReportManager()
+    assert rm.get_today_report("P001") is None
+    
+    success, report_id = rm.save_report("P001", {"pain": 4, "mood": 2})
+    
+    assert success
+    today = rm.get_today_report("P001")
+    assert today["report_id"] == report_id
+    assert today["scores"]["pain"] == 4
+    assert reports.downloads == 1
+
+
+def test_cold_cache_is_not_filled_by_writes(spreadsheet, clock):
+    reports = spreadsheet.sheets[g.SHEET_REPORTS]
+    rm = g.ReportManager()
+    
+    rm.save_report("P001", {"pain": 1})
+    
+    assert g._RECORDS_CACHE == {}
+    assert len(rm.get_patient_reports("P001")) == 1
+    assert reports.downloads == 1
+
+
+def test_unlocked_achievements_are_added_to_cache(spreadsheet, clock):
+    achievements = spreadsheet.sheets[g.SHEET_ACHIEVEMENTS]
+    am = g.AchievementManager()
+    assert am.get_patient_achievements("P001") == []
+    
+    stats = g.Compliance(total_completed=1, current_streak=3)
+    unlocked = [a["id"] for a in am.check_and_unlock("P001", stats)]
+    
+    assert unlocked == ["first_report", "streak_3"]
+    assert [a["id"] for a in am.get_patient_achievements("P001")] == unlocked
+    assert am.check_and_unlock("P001", stats) == []
+    assert achievements.downloads == 1
+
+
+def test_cache_is_keyed_per_spreadsheet(spreadsheet, clock):
+    day = g.date.today().isoformat()
+    first = spreadsheet.sheets[g.SHEET_REPORTS]
+    first.rows.append(report_row("R1", "P001", day))
+    other = FakeSpreadsheet()
+    other.id = "other-spreadsheet"
+    second = other.sheets[g.SHEET_REPORTS]
+    second.rows.append(report_row("R2", "P001", day))
+    
+    report_id = g.SHEET_SCHEMAS[g.SHEET_REPORTS][2][0]
+    assert [r[report_id] for r in g._cached_records_by(first, "病人ID")["P001"]] == ["R1"]
+    assert [r[report_id] for r in g._cached_records_by(second, "病人ID")["P001"]] == ["R2"]
+    assert set(g._RECORDS_CACHE) == {
+        ("test-spreadsheet", g.SHEET_REPORTS), ("other-spreadsheet", g.SHEET_REPORTS)}
+
+
+def test_records_are_grouped_per_patient_in_sheet_order(spreadsheet, clock):
+    reports = spreadsheet.sheets[g.SHEET_REPORTS]
+    for report_id, patient_id in [("R1", "P001"), ("R2", "P002"), ("R3", "P001")]:
+        reports.rows.append(report_row(report_id, patient_id, "2026-10-01"))
+    report_id = g.SHEET_SCHEMAS[g.SHEET_REPORTS][2][0]
+    
+    grouped = g._cached_records_by(reports, "病人ID")
+    
+    assert [r[report_id] for r in grouped["P001"]] == ["R1", "R3"]
+    assert [r[report_id] for r in grouped["P002"]] == ["R2"]
+    assert g._cached_records_by(reports, "病人ID") is grouped
+    assert reports.downloads == 1
+
+
+def test_appended_rows_join_existing_groups(spreadsheet, clock):
+    reports = spreadsheet.sheets[g.SHEET_REPORTS]
+    reports.rows.append(report_row("R1", "P001", "2026-10-01"))
+    report_id = g.SHEET_SCHEMAS[g.SHEET_REPORTS][2][0]
+    g._cached_records_by(reports, "病人ID")
+    
+    new_rows = [report_row("R2", "P001", "2026-10-02"), report_row("R3", "P003", "2026-10-02")]
+    reports.append_rows(new_rows)
+    g._append_cached_records(reports, new_rows)
+    
+    grouped = g._cached_records_by(reports, "病人ID")
+    assert [r[report_id] for r in grouped["P001"]] == ["R1", "R2"]
+    assert [r[report_id] for r in grouped["P003"]] == ["R3"]
+    assert reports.downloads == 1
+
+
+# ============================================
+# 病人資料
+# ============================================
+
+def register(pm, patient_id, password="secret123"):
+    return pm.register_patient(
+        patient_id, "王小明", "男", 65, "1961-01-01", "0912345678",
+        "2026-10-01", "肺葉切除", "IA", password)
+
+
+def test_patient_snapshot_is_reused_within_ttl(spreadsheet, clock):
+    patients = spreadsheet.sheets[g.SHEET_PATIENTS]
+    pm = g.PatientManager()
+    register(pm, "P001")
+    
+    assert pm.get_patient("P001").name == "王小明"
+    assert pm.login("P001", "secret123")[0]
+    assert not pm.login("P001", "wrong")[0]
+    assert patients.downloads == 1
+    
+    clock[0] += g.PATIENTS_CACHE_TTL
+    assert pm.get_patient("P001") is not None
+    assert patients.downloads == 2
+
+
+def test_registration_refreshes_snapshot(spreadsheet, clock):
+    pm = g.PatientManager()
+    assert pm.get_patient("P002") is None
+    
+    assert register(pm, "P002")[0]
+    
+    assert pm.get_patient("P002").id == "P002"
+
+
+def test_duplicate_registration_is_rejected(spreadsheet, clock):
+    patients = spreadsheet.sheets[g.SHEET_PATIENTS]
+    pm = g.PatientManager()
+    assert register(pm, "P001")[0]
+    
+    # 快取未載入：以工作表查詢判斷
+    assert register(pm, "P001") == (False, "此病歷號已註冊")
+    assert patients.finds == 2
+    
+    # 快取已載入：不必再查詢工作表
+    pm.get_patient("P001")
+    assert register(pm, "P001") == (False, "此病歷號已註冊")
+    assert patients.finds == 2
+    assert len(patients.rows) == 2
+
+
+# ============================================
+# 密碼雜湊
+# ============================================
+
+def test_scrypt_hash_round_trip():
+    hashed = g.hash_password("secret123")
+    
+    assert hashed.startswith("scrypt$")
+    assert g.verify_password("secret123", hashed)
+    assert hashed != g.hash_password("secret123")
+
+
+def test_legacy_sha256_hash_still_verifies():
+    legacy = g.hashlib.sha256("secret123".encode()).hexdigest()
+    
+    assert g.verify_password("secret123", legacy)
+    assert not g.verify_password("secret124", legacy)
+
+
+def test_wrong_password_is_rejected():
+    hashed = g.hash_password("secret123")
+    
+    assert not g.verify_password("secret124", hashed)
+    assert not g.verify_password("", hashed)
+    assert not g.verify_password("secret123", "scrypt$not-hex$zz")
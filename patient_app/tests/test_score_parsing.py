@@ -0,0 +1,22 @@
+"""AI 對話文字輸入的分數解析"""
+
+import pytest
+
+from app import parse_score_from_text
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("3分", 3),
+    ("10", 10),
+    ("第14天 3分", 3),
+    # 中文輸入法常見的全形數字
+    ("５分", 5),
+    ("１０", 10),
+    ("５分 很痛很不舒服", 5),
+    # 補零輸入
+    ("05", 5),
+    ("很痛", 7),
+    ("14", None),
+])
+def test_parse_score_from_text(text, expected):
+    assert parse_score_from_text(text) == expected
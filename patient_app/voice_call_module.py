@@ -528,7 +528,7 @@ def render_request_callback(patient):
     if twilio_ready:
         st.success("✅ 語音電話功能已啟用")
         
-        phone = patient.get("phone", "")
+        phone = patient.phone
         if phone:
             st.info(f"📱 將撥打至：{phone}")
             
@@ -537,10 +537,10 @@ def render_request_callback(patient):
                 if st.button("📞 請 AI 打給我", type="primary", use_container_width=True):
                     with st.spinner("正在撥打電話..."):
                         result = request_ai_callback(
-                            patient_id=patient.get("patient_id", "demo"),
-                            patient_name=patient.get("name", "先生/小姐"),
+                            patient_id=patient.id,
+                            patient_name=patient.name or "先生/小姐",
                             phone_number=phone,
-                            post_op_day=patient.get("post_op_day", 1)
+                            post_op_day=patient.post_op_day
                         )
                     
                     if result.get("success"):
@@ -649,8 +649,8 @@ def render_active_call(patient):
         
         # 顯示 AI 的話
         ai_text = step["content"].format(
-            patient_name=patient.get("name", "先生/小姐"),
-            post_op_day=patient.get("post_op_day", 1),
+            patient_name=patient.name or "先生/小姐",
+            post_op_day=patient.post_op_day,
             summary=generate_summary(),
             follow_up_action=get_follow_up_action(calculate_alert_level(
                 st.session_state.voice_call_scores, 